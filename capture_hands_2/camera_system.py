@@ -5,6 +5,8 @@ import time
 import queue
 import os
 from config import AppConfig
+from capture_writer import CaptureWriter
+from dataset_shards import ShardWriter
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -30,6 +32,14 @@ class CameraSystem:
 
         self.capture_dir = os.path.join(BASE_DIR, "data")
 
+        # Último snapshot del joystick (joystick_record) que publica el EventHandler en cada frame de la UI.
+        # La captura guarda ese estado con su propio sampled_at: puede atrasar hasta un frame respecto de la imagen
+        self.joystick_state = None
+
+        # Escritura de capturas en segundo plano: arranca en initialize(), junto con la cámara,
+        # para que un CameraSystem sin cámara no deje hilos ni archivos abiertos
+        self.capture_writer = None
+
 
         self.last_capture_status = None  
         self.last_capture_time = 0
@@ -50,6 +60,8 @@ class CameraSystem:
             
             actual_fps = self.cap.get(5)
             print(f"FPS de cámara: {actual_fps}")
+
+            self._start_capture_writer()
             
             # Iniciar hilo de cámara
             self.running = True
@@ -65,6 +77,18 @@ class CameraSystem:
             print(self.error_message)
             return False
     
+    def _start_capture_writer(self):
+        if self.capture_writer is not None:
+            return
+
+        sink = None
+        if AppConfig.DATASET_SHARDS:
+            sink = ShardWriter(os.path.join(BASE_DIR, AppConfig.DATASET_SHARDS))
+            print(f"Dataset en shards: {sink.root} (sesión {sink.session})")
+        # Contadores por directorio sembrados una vez
+        self.capture_writer = CaptureWriter(on_saved=self._on_capture_saved, sink=sink, save_files=AppConfig.SAVE_FOLDERS)
+        self.capture_writer.seed(self.capture_dir)
+
     def _camera_loop(self):
         """Hilo separado para capturar frames de la cámara"""
         print("Hilo de cámara iniciado")
@@ -136,29 +160,30 @@ class CameraSystem:
         
 
     def take_capture(self, frame_rgb):
-        try:
-            # Verificamos que el directorio existe (por si acaso)
-            os.makedirs(self.capture_dir, exist_ok=True)
-        
-            # Contamos los archivos JPG en el directorio
-            pic_count = len([pic for pic in os.listdir(self.capture_dir) if pic.endswith('.jpg')])
-
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            filename = f"{self.capture_dir}/{pic_count}_{self.capture_dir}_{timestamp}.jpg"
-            frame_bgr = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
-            cv2.imwrite(filename, frame_bgr)
-
-            if "basura" in self.capture_dir:
-                self.last_capture_status = "trash"
-                print(f"🗑️ Captura enviada a BASURA: {filename}")
-            else:
-                self.last_capture_status = "success"
-                print(f"✅ Captura guardada correctamente: {filename}")
-
-            self.last_capture_time = time.time()
-            
-        except Exception as e:
-            print(f"Error en captura automática: {e}")
+        # Solo encolamos: índice, conversión a BGR y JPEG van en los workers del writer
+        state = self.joystick_state
+        self.capture_writer.submit(frame_rgb, self.capture_dir, None if state is None else state.record)
+
+    def _on_capture_saved(self, filename, directory):
+        if "basura" in directory:
+            self.last_capture_status = "trash"
+            print(f"🗑️ Captura enviada a BASURA: {filename}")
+        else:
+            self.last_capture_status = "success"
+            print(f"✅ Captura guardada correctamente: {filename}")
+
+        self.last_capture_time = time.time()
+
+    def shutdown(self):
+        # Paramos la cámara y esperamos a que se escriban las capturas pendientes
+        self.running = False
+        if self.camera_thread is not None:
+            self.camera_thread.join(timeout=1.0)
+        if self.capture_writer is not None:
+            self.capture_writer.close()
+            self.capture_writer = None
+        if self.cap is not None:
+            self.cap.release()
 
 
     def toggle_auto_capture(self, button_name):
@@ -179,9 +204,11 @@ class CameraSystem:
         return self.auto_capture
     
     def set_current_directory(self, directory):
-        self.capture_dir = os.path.join(BASE_DIR, "data", directory)
-        os.makedirs(self.capture_dir, exist_ok=True)
-        os.makedirs(self.capture_dir, exist_ok=True)
+        # Se llama en cada frame de la UI: solo tocamos el disco si cambia el directorio
+        capture_dir = os.path.join(BASE_DIR, "data", directory)
+        if capture_dir != self.capture_dir:
+            self.capture_dir = capture_dir
+            os.makedirs(self.capture_dir, exist_ok=True)
 
 
     def change_capture_button(self, button_name):
@@ -0,0 +1,127 @@
+import cv2
+import os
+import queue
+import threading
+import time
+
+from joystick_record import append_record, to_dict
+
+
+class CaptureWriter:
+    """Guarda las capturas en disco desde un pool de hilos, fuera del hilo de la cámara.
+
+    El hilo de la cámara solo encola el frame. Los workers asignan el índice del
+    archivo con contadores en memoria (uno por directorio, sembrados una sola vez
+    contando los .jpg existentes), convierten a BGR y codifican el JPEG una vez, que
+    va al .jpg suelto y/o al sink del dataset (ShardWriter). El registro del joystick
+    (joystick_record, el último snapshot de la UI con su sampled_at) se agrega a
+    joystick.bin junto a las imágenes.
+    """
+
+    def __init__(self, num_workers=2, max_queue=32, on_saved=None, sink=None, save_files=True):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.on_saved = on_saved
+        self.sink = sink
+        self.save_files = save_files
+
+        self.counters = {}
+        self.counters_lock = threading.Lock()
+        self.records_lock = threading.Lock()
+        self.dropped = 0
+        self.closed = False
+
+        self.workers = [threading.Thread(target=self._worker_loop, daemon=True) for _ in range(num_workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def seed(self, base_dir):
+        # Al arrancar: un solo listdir por directorio de etiquetas ya existente
+        if not os.path.isdir(base_dir):
+            return
+        for name in os.listdir(base_dir):
+            directory = os.path.join(base_dir, name)
+            if os.path.isdir(directory):
+                self._seed_directory(directory)
+
+    def _seed_directory(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        pic_count = len([pic for pic in os.listdir(directory) if pic.endswith('.jpg')])
+        self.counters[directory] = pic_count
+
+    def _next_index(self, directory):
+        with self.counters_lock:
+            if directory not in self.counters:
+                # Directorio nuevo desde que arrancamos: se cuenta una vez y después va en memoria
+                self._seed_directory(directory)
+            index = self.counters[directory]
+            self.counters[directory] += 1
+        return index
+
+    def submit(self, frame_rgb, directory, joystick=None):
+        # Lo único que paga el hilo de la cámara. frame_rgb es un array nuevo en cada frame: no hace falta copiarlo
+        try:
+            self.queue.put_nowait((frame_rgb, directory, time.time(), joystick))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"Cola de capturas llena, se descarta la captura ({self.dropped} descartadas)")
+            return False
+
+    def _save(self, frame_rgb, directory, timestamp, joystick):
+        label = os.path.basename(directory)
+        frame_bgr = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+        ok, jpeg = cv2.imencode(".jpg", frame_bgr)
+        if not ok:
+            raise IOError(f"No se pudo codificar la captura de {label}")
+
+        if joystick is not None:
+            joystick = joystick.copy()
+            joystick["timestamp"] = timestamp
+
+        saved = None
+        if self.sink is not None:
+            saved = self.sink.write(jpeg.tobytes(), label, timestamp, None if joystick is None else to_dict(joystick))
+
+        if self.save_files:
+            index = self._next_index(directory)
+            saved = os.path.join(directory, f"{index}_{label}_{time.strftime('%Y%m%d_%H%M%S', time.localtime(timestamp))}.jpg")
+            with open(saved, "wb") as f:
+                f.write(jpeg)
+
+            if joystick is not None:
+                joystick["index"] = index
+                with self.records_lock:
+                    append_record(directory, joystick)
+        return saved
+
+    def _worker_loop(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+
+                frame_rgb, directory, timestamp, joystick = item
+                filename = self._save(frame_rgb, directory, timestamp, joystick)
+                if self.on_saved is not None:
+                    self.on_saved(filename, directory)
+            except Exception as e:
+                print(f"Error guardando captura: {e}")
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        # Espera a que se escriban todas las capturas encoladas
+        self.queue.join()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.flush()
+        for _ in self.workers:
+            self.queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        if self.sink is not None:
+            self.sink.close()
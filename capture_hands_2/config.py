@@ -26,6 +26,11 @@ class AppConfig:
     
 
     SAVE_PATH = "gesture_data"
+
+    # Dataset en shards tar (dataset_shards.py), relativo a capture_hands_2; None = desactivado
+    DATASET_SHARDS = None
+    # Con shards activos se puede dejar de escribir un .jpg suelto por captura
+    SAVE_FOLDERS = True
     
 
     MAX_RECORDING_FRAMES = 300
\ No newline at end of file
@@ -0,0 +1,183 @@
+import argparse
+import glob
+import io
+import json
+import os
+import re
+import tarfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+SHARD_MAX_RECORDS = 1000
+SHARD_MAX_BYTES = 256 * 1024 * 1024
+SHARD_PATTERN = "shard-{:06d}.tar"
+INDEX_FILE = "index.jsonl"
+TAR_BLOCK = 512
+
+
+class ShardWriter:
+    """Dataset en shards tar estilo WebDataset: <key>.jpg + <key>.json por muestra.
+
+    Los shards solo se agregan (nunca se reabren); cada sesión arranca uno nuevo.
+    index.jsonl tiene una línea por muestra con el shard y el offset del JPEG para
+    acceso aleatorio sin recorrer el tar.
+    """
+
+    def __init__(self, root, session=None, max_records=SHARD_MAX_RECORDS, max_bytes=SHARD_MAX_BYTES):
+        self.root = root
+        self.session = session or time.strftime("%Y%m%d_%H%M%S")
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+
+        os.makedirs(root, exist_ok=True)
+        self.shard_index = len(glob.glob(os.path.join(root, "shard-*.tar")))
+        self.index = open(os.path.join(root, INDEX_FILE), "a")
+
+        self.tar = None
+        self.shard_name = None
+        self.records = 0
+        self.sample = 0
+        self.lock = threading.Lock()
+
+    def _open_shard(self):
+        self.shard_name = SHARD_PATTERN.format(self.shard_index)
+        self.shard_index += 1
+        # USTAR: un solo bloque de header por miembro, el offset del dato es predecible
+        self.tar = tarfile.open(os.path.join(self.root, self.shard_name), "w", format=tarfile.USTAR_FORMAT)
+        self.records = 0
+
+    def _close_shard(self):
+        if self.tar is not None:
+            self.tar.close()
+            self.tar = None
+
+    def _add(self, name, data, mtime):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(mtime)
+        offset = self.tar.offset
+        self.tar.addfile(info, io.BytesIO(data))
+        return offset + TAR_BLOCK
+
+    def write(self, jpeg, label, timestamp=None, joystick=None):
+        # jpeg: bytes ya codificados; joystick: dict con los valores crudos (o None)
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            if self.tar is None or self.records >= self.max_records or self.tar.offset >= self.max_bytes:
+                self._close_shard()
+                self._open_shard()
+
+            key = f"{self.session}_{self.sample:07d}"
+            self.sample += 1
+            meta = {"label": label, "timestamp": timestamp, "session": self.session, "joystick": joystick}
+
+            offset = self._add(f"{key}.jpg", jpeg, timestamp)
+            self._add(f"{key}.json", json.dumps(meta).encode(), timestamp)
+            self.records += 1
+
+            self.index.write(json.dumps({"key": key, "shard": self.shard_name, "offset": offset, "size": len(jpeg), "label": label}) + "\n")
+            self.index.flush()
+        return key
+
+    def close(self):
+        with self.lock:
+            self._close_shard()
+            self.index.close()
+
+
+def read_index(root):
+    with open(os.path.join(root, INDEX_FILE)) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_sample(root, entry):
+    # Acceso aleatorio con una entrada del índice: un seek y un read, sin abrir el tar
+    with open(os.path.join(root, entry["shard"]), "rb") as f:
+        f.seek(entry["offset"])
+        return f.read(entry["size"])
+
+
+def read_shards(root, labels=None, decode=False):
+    """Recorre los shards en orden, de a una muestra: (jpeg o imagen BGR, meta)."""
+    for path in sorted(glob.glob(os.path.join(root, "shard-*.tar"))):
+        # Lectura en streaming ("r|"): secuencial, sin tabla de miembros en memoria
+        with tarfile.open(path, "r|") as tar:
+            jpeg = None
+            for member in tar:
+                data = tar.extractfile(member).read()
+                if member.name.endswith(".jpg"):
+                    jpeg = data
+                    continue
+
+                meta = json.loads(data)
+                if jpeg is None or (labels is not None and meta["label"] not in labels):
+                    jpeg = None
+                    continue
+
+                sample = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR) if decode else jpeg
+                jpeg = None
+                yield sample, meta
+
+
+FILENAME_TIMESTAMP = re.compile(r"_(\d{8}_\d{6})\.jpg$")
+
+
+def convert_folders(data_dir, root, session=None, max_records=SHARD_MAX_RECORDS):
+    # data/<etiqueta>/*.jpg -> shards, sin recodificar; el timestamp sale del nombre o del mtime
+    session = session or time.strftime("converted_%Y%m%d_%H%M%S")
+    writer = ShardWriter(root, session=session, max_records=max_records)
+    count = 0
+    try:
+        for label in sorted(os.listdir(data_dir)):
+            directory = os.path.join(data_dir, label)
+            if not os.path.isdir(directory):
+                continue
+
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(".jpg"):
+                    continue
+                path = os.path.join(directory, name)
+                match = FILENAME_TIMESTAMP.search(name)
+                if match:
+                    timestamp = time.mktime(time.strptime(match.group(1), "%Y%m%d_%H%M%S"))
+                else:
+                    timestamp = os.path.getmtime(path)
+
+                with open(path, "rb") as f:
+                    writer.write(f.read(), label, timestamp)
+                count += 1
+    finally:
+        writer.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dataset de capturas en shards tar")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Convierte data/<etiqueta>/*.jpg a shards")
+    convert.add_argument("data_dir")
+    convert.add_argument("output")
+    convert.add_argument("--max-records", type=int, default=SHARD_MAX_RECORDS)
+
+    info = subparsers.add_parser("info", help="Muestras por etiqueta según el índice")
+    info.add_argument("root")
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        count = convert_folders(args.data_dir, args.output, max_records=args.max_records)
+        print(f"{count} capturas convertidas en {args.output}")
+    else:
+        counts = {}
+        for entry in read_index(args.root):
+            counts[entry["label"]] = counts.get(entry["label"], 0) + 1
+        for label, count in sorted(counts.items()):
+            print(f"{label}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,22 @@
 import pygame
+from joystick_record import JoystickSnapshot
+
+
+# Combos de gatillos/bumpers: combo_L1_R1 -> bumper_L + bumper_R
+SHOULDER_BUTTONS = {
+    'L1': 'bumper_L',
+    'L2': 'trigger_L',
+    'R1': 'bumper_R',
+    'R2': 'trigger_R'
+}
+DPAD_BUTTONS = {
+    'button_UP': 'up',
+    'button_DOWN': 'down',
+    'button_LEFT': 'left',
+    'button_RIGHT': 'right'
+}
+STICK_THRESHOLD = 0.2
+TRIGGER_THRESHOLD = 0.5
 
 
 class EventHandler:
@@ -6,13 +24,14 @@ class EventHandler:
         self.app = app
 
         self.joystick = None
+        self.state = None
         self.init_joystick()
 
 
     def update_joystick(self):
+        # Una sola lectura por frame (pygame.event.get ya hizo el pump); todo lo demás consulta el snapshot
         if self.joystick:
-            pygame.joystick.Joystick(0).init() 
-            pygame.event.pump()
+            self.state = JoystickSnapshot.read(self.joystick)
 
 
     def init_joystick(self):
@@ -29,6 +48,8 @@ class EventHandler:
                 self.type += 1
 
             self.init_buttons_maps()
+            self.init_label_table()
+            self.state = JoystickSnapshot.read(self.joystick)
         else:
             # print("No se encontró joystick/gamepad")
             raise Exception("No se encontró joystick/gamepad")
@@ -75,77 +96,81 @@ class EventHandler:
             (-1, 0): 'left',
             (1, 0): 'right',
         }
-        
 
+    def init_label_table(self):
+        # Etiqueta -> (predicado sobre el snapshot, directorio de captura), armada una sola vez.
+        # Reemplaza el startswith/replace/split por frame: la etiqueta activa es un lookup
+        self.buttons = {}
+        for button_name, index in self.button_number.items():
+            self.buttons[button_name] = lambda state, index=index: state.button(index)
+
+        # Gatillos como eje si el joystick lo tiene; si no, como botón
+        num_axes = self.joystick.get_numaxes()
+        for trigger in ("trigger_L", "trigger_R"):
+            if self.axis[trigger] < num_axes:
+                self.buttons[trigger] = lambda state, axis=self.axis[trigger]: state.axes[axis] > TRIGGER_THRESHOLD
+
+        self.labels = {name: (predicate, name) for name, predicate in self.buttons.items()}
+
+        for stick in ("stick_left", "stick_right"):
+            x_axis, y_axis = self.axis[stick]
+            for position, direction in self.stick_directions.items():
+                self.labels[f"{stick}_{direction}"] = (
+                    lambda state, x=x_axis, y=y_axis, position=position: self._stick_position(state, x, y) == position,
+                    f"{stick}_{direction}"
+                )
+
+        hats = {direction: hat for hat, direction in self.dpad_direction.items()}
+        for button_name, direction in DPAD_BUTTONS.items():
+            self.labels[button_name] = (lambda state, hat=hats[direction]: state.hat == hat, f"dpad_{direction}")
+
+        for first, first_button in SHOULDER_BUTTONS.items():
+            for second, second_button in SHOULDER_BUTTONS.items():
+                if first == second:
+                    continue
+                label = f"combo_{first}_{second}"
+                self.labels[label] = (
+                    lambda state, a=self.buttons[first_button], b=self.buttons[second_button]: a(state) and b(state),
+                    label
+                )
+
+    @staticmethod
+    def _stick_position(state, x_axis, y_axis):
+        #Vemos el valor de la psoicion y la pasamos a {1;0;-1}
+        x_value = state.axes[x_axis]
+        y_value = state.axes[y_axis]
+        x_dir = 0 if abs(x_value) < STICK_THRESHOLD else (1 if x_value > 0 else -1)
+        y_dir = 0 if abs(y_value) < STICK_THRESHOLD else (1 if y_value > 0 else -1)
+        return x_dir, y_dir
+
+    def read_joystick_state(self):
+        # Snapshot del frame; la captura toma de acá el registro crudo (ejes, máscara de botones, hat)
+        return self.state
 
     def is_button_pressed(self, button_name):
-        if not self.joystick:
+        if self.state is None:
             return False
-        
-        if button_name == "trigger_L": 
-            try:
-                axis_value = self.joystick.get_axis(self.axis[button_name])
-                return axis_value > 0.5 
-            except:
-                if self.joystick.get_numbuttons() > self.button_number[button_name]:
-                    return self.joystick.get_button(self.button_number[button_name]) == 1
-                return False
-        
-        elif button_name == "trigger_R":  
-
-            try:
-                axis_value = self.joystick.get_axis(self.axis[button_name])  
-                return axis_value > 0.5  
-            except:
-
-                if self.joystick.get_numbuttons() > self.button_number[button_name]:
-                    return self.joystick.get_button(self.button_number[button_name]) == 1
-                return False
 
-        button_index = self.button_number.get(button_name)
-        if button_index is not None and button_index < self.joystick.get_numbuttons():
-            return self.joystick.get_button(button_index) == 1
-        
-        return False
+        predicate = self.buttons.get(button_name)
+        return predicate is not None and predicate(self.state)
     
 
     def get_dpad_direction(self):
         #Parte del gamepad izquierdo
-        if not self.joystick:
+        if self.state is None:
             return None
-        
-        if self.joystick.get_numhats() < 1:
-            return None
-        
-        hat = self.joystick.get_hat(0)
+
         # x: -1 = izquierda, 0 = centro, 1 = derecha
         # y: -1 = abajo, 0 = centro, 1 = arriba
-        
-        x, y = hat
-        
-        # Mapear ampeamos direcciones
-        return self.dpad_direction.get((x, y), None)
+        return self.dpad_direction.get(self.state.hat, None)
         
     def is_dpad_pressed(self, direction):
         current_direction = self.get_dpad_direction()
         return current_direction == direction
 
     def get_stick_direction_9_way(self, stick_name):
-
-        #Vemos de cual se stick se trata y obtenemos sus valores
         x_axis, y_axis = self.axis[stick_name]
-        x_value = self.joystick.get_axis(x_axis)
-        y_value = self.joystick.get_axis(y_axis)
-
-
-        threshold = 0.2
-
-        #Vemos el valor de la psoicion y la pasamos a {1;0;-1}
-        x_dir = 0 if abs(x_value) < threshold else (1 if x_value > 0 else -1)
-        y_dir = 0 if abs(y_value) < threshold else (1 if y_value > 0 else -1)
-
-        #Mapeamos las direcciones posibles
-        return self.stick_directions.get((x_dir, y_dir))
+        return self.stick_directions.get(self._stick_position(self.state, x_axis, y_axis))
     
     def is_stick_in_direction(self, stick_name, direction):
    
@@ -154,61 +179,11 @@ class EventHandler:
     
 
     def is_pressing_correct_button(self, button_name):
-        if not button_name:
-            return False
-        
-        if not self.joystick:
-            return False
-        
-        #Caso sticks
-        if button_name.startswith(('stick_right_', 'stick_left_')):
-            direction = button_name.replace("stick_right_", "").replace("stick_left_", "")
-            stick_name_only = 'stick_right' if 'stick_right' in button_name else 'stick_left'
-            return self.is_stick_in_direction(stick_name_only, direction)
-        
-        #Caso triggers
-        elif button_name.startswith('combo_'):
-            # Extraemos los dos botones de la combinación
-            # combo_L1_R1 -> ['L1', 'R1']
-            parts = button_name.replace('combo_', '').split('_')
-            if len(parts) == 2:
-                button1 = parts[0]  
-                button2 = parts[1]  
-                
-                button_map = {
-                    'L1': 'bumper_L',
-                    'L2': 'trigger_L',
-                    'R1': 'bumper_R',
-                    'R2': 'trigger_R'
-                }
-                
-                tech_button1 = button_map.get(button1)
-                tech_button2 = button_map.get(button2)
-                
-                # Verifiamos ambos presionados
-                return (self.is_button_pressed(tech_button1) and self.is_button_pressed(tech_button2))
+        if not button_name or self.state is None:
             return False
-        
-        #Caso d-pad y gamepad derecho
-        elif button_name.startswith('dpad_') or button_name.startswith('button_'):
-            if button_name == 'button_UP':
-                return self.is_dpad_pressed('up')
-            elif button_name == 'button_DOWN':
-                return self.is_dpad_pressed('down')
-            elif button_name == 'button_LEFT':
-                return self.is_dpad_pressed('left')
-            elif button_name == 'button_RIGHT':
-                return self.is_dpad_pressed('right')
-            else:
-                return self.is_button_pressed(button_name)
-            
-        #Triggers indiviaudales
-        elif button_name in ['trigger_L', 'trigger_R', 'bumper_L', 'bumper_R']:
-            return self.is_button_pressed(button_name)
 
-        # otros botones
-        else:
-            return self.is_button_pressed(button_name)
+        entry = self.labels.get(button_name)
+        return entry is not None and entry[0](self.state)
 
 
     
@@ -222,67 +197,18 @@ class EventHandler:
                 self.app.handle_resize(event.w, event.h)
 
         self.update_joystick()
+        self.app.camera_system.joystick_state = self.read_joystick_state()
         self.update_active_button()
         
 
     def get_capture_directory_for_active(self, button_name):
+        # Etiquetas desconocidas (o sin joystick) van a basura, como antes
+        entry = self.labels.get(button_name)
+        if entry is None or self.state is None:
+            return "basura"
 
-        #cASO STICKS
-        if button_name.startswith(('stick_right_', 'stick_left_')):
-            direction =  button_name.replace("stick_right_", "").replace("stick_left_", "")
-            stick_name = 'stick_right' if 'stick_right' in button_name else 'stick_left'
-
-            current_direction = self.get_stick_direction_9_way(stick_name)
-
-            if current_direction == direction:
-                return f"{stick_name}_{direction}"
-            else:
-                return "basura"
-
-        #Triggers
-        elif button_name.startswith('combo_'):
-            if self.is_pressing_correct_button(button_name):
-                return button_name 
-            else:
-                return "basura"
-
-
-        # CASO D-Pad o gamepad derecho
-        elif button_name.startswith('button_'):
-            if button_name in ['button_UP', 'button_DOWN', 'button_LEFT', 'button_RIGHT']:
-                direction_map = {
-                    'button_UP': 'up',
-                    'button_DOWN': 'down',
-                    'button_LEFT': 'left',
-                    'button_RIGHT': 'right'
-                }
-                expected_direction = direction_map[button_name]
-                current_direction = self.get_dpad_direction()
-                
-                if current_direction == expected_direction:
-                    return f"dpad_{expected_direction}"
-                else:
-                    return "basura"
-            else:
-                if self.is_button_pressed(button_name):
-                    return button_name
-                else:
-                    return "basura"
-
-        #Triggers indiviadules
-        elif button_name in ['trigger_L', 'trigger_R', 'bumper_L', 'bumper_R']:
-            if self.is_button_pressed(button_name):
-                return button_name
-            else:
-                return "basura"
-
-
-        #Otros botones
-        else:
-            if self.is_button_pressed(button_name):
-                return button_name
-            else:
-                return "basura"
+        predicate, directory = entry
+        return directory if predicate(self.state) else "basura"
 
 
     def update_active_button(self):
@@ -33,4 +33,8 @@ class GestureRecorder:
     def cleanup(self):
         if self.camera_system.auto_capture:
             self.camera_system.auto_capture = False
-            self.camera_system.frame_counter = 0
\ No newline at end of file
+            self.camera_system.frame_counter = 0
+
+        # Las capturas encoladas terminan de escribirse antes de volver al menú
+        if self.camera_system.capture_writer is not None:
+            self.camera_system.capture_writer.flush()
\ No newline at end of file
@@ -0,0 +1,97 @@
+import os
+import time
+
+import numpy as np
+
+
+MAX_AXES = 8
+MAX_BUTTONS = 32
+RECORD_FILE = "joystick.bin"
+
+# Un registro por captura, empaquetado (59 bytes): se lee como memmap sin parsear nada.
+# El estado es el último snapshot de la UI, no una lectura en el instante de la captura:
+# sampled_at - timestamp dice cuánto atrasa (hasta un frame de la UI)
+JOYSTICK_DTYPE = np.dtype([
+    ("index", "<u4"),          # Índice del .jpg en el directorio ({index}_{label}_{fecha}.jpg)
+    ("timestamp", "<f8"),      # time.time() de la captura (cuando el hilo de la cámara encola el frame)
+    ("sampled_at", "<f8"),     # time.time() de la lectura del joystick (snapshot del EventHandler)
+    ("axes", "<f4", (MAX_AXES,)),
+    ("buttons", "<u4"),        # Bit i = botón i presionado
+    ("hat", "i1", (2,)),       # (x, y) del primer hat; y = 1 arriba
+    ("num_axes", "u1"),
+])
+
+
+def to_dict(record):
+    # Para la metadata json de los shards
+    return {
+        "axes": record["axes"][:record["num_axes"]].tolist(),
+        "buttons": int(record["buttons"]),
+        "hat": record["hat"].tolist(),
+        "sampled_at": float(record["sampled_at"]),
+    }
+
+
+def append_record(directory, record):
+    with open(os.path.join(directory, RECORD_FILE), "ab") as f:
+        f.write(record.tobytes())
+
+
+def load_records(directory):
+    """Registros de un directorio de capturas como memmap de solo lectura."""
+    path = os.path.join(directory, RECORD_FILE)
+    if not os.path.exists(path) or os.path.getsize(path) < JOYSTICK_DTYPE.itemsize:
+        return np.zeros(0, dtype=JOYSTICK_DTYPE)
+    # Una escritura cortada a la mitad deja bytes de más al final: se ignoran
+    count = os.path.getsize(path) // JOYSTICK_DTYPE.itemsize
+    return np.memmap(path, dtype=JOYSTICK_DTYPE, mode="r", shape=(count,))
+
+
+def button_pressed(records, button):
+    # Máscara booleana por registro, p. ej. para re-etiquetar offline
+    return (records["buttons"] >> np.uint32(button)) & 1 == 1
+
+
+class JoystickSnapshot:
+    """Estado del joystick leído una sola vez por frame.
+
+    axes, buttons (máscara) y hat quedan en tipos de Python para que los predicados de
+    etiquetas no toquen ni pygame ni numpy; el registro estructurado se arma recién
+    cuando una captura lo pide.
+    """
+
+    __slots__ = ("axes", "buttons", "hat", "timestamp", "_record")
+
+    def __init__(self, axes, buttons, hat, timestamp=None):
+        self.axes = axes
+        self.buttons = buttons
+        self.hat = hat
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self._record = None
+
+    @classmethod
+    def read(cls, joystick):
+        axes = [joystick.get_axis(i) for i in range(min(joystick.get_numaxes(), MAX_AXES))]
+
+        buttons = 0
+        for i in range(min(joystick.get_numbuttons(), MAX_BUTTONS)):
+            if joystick.get_button(i):
+                buttons |= 1 << i
+
+        hat = tuple(joystick.get_hat(0)) if joystick.get_numhats() else (0, 0)
+        return cls(axes, buttons, hat)
+
+    def button(self, index):
+        return self.buttons >> index & 1 == 1
+
+    @property
+    def record(self):
+        if self._record is None:
+            record = np.zeros((), dtype=JOYSTICK_DTYPE)
+            record["axes"][:len(self.axes)] = self.axes
+            record["num_axes"] = len(self.axes)
+            record["buttons"] = self.buttons
+            record["hat"] = self.hat
+            record["sampled_at"] = self.timestamp
+            self._record = record
+        return self._record
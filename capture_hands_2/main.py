@@ -44,6 +44,9 @@ def main():
         elif menu.selected_option == 'TRIGGERS':
             menu = GestureRecorder("TRIGGERS", window, RendererTriggers, shared_camera)
 
+    if shared_camera is not None:
+        shared_camera.shutdown()
+
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,49 @@
+import time
+from collections import Counter, deque
+
+import numpy as np
+import torch
+
+MAX_WAIT = 0.005 # Segundos que esperamos a otras fuentes para llenar el batch
+WAIT_SAMPLES = 1000
+
+class BatchStats:
+    """Tamanos de batch logrados y espera de cada frame entre la captura y el forward."""
+
+    def __init__(self, samples=WAIT_SAMPLES):
+        self.sizes = Counter()
+        self.waits = deque(maxlen=samples)
+        self.forwards = 0
+        self.frames = 0
+
+    def record(self, frames):
+        now = time.monotonic()
+        self.forwards += 1
+        self.frames += len(frames)
+        self.sizes[len(frames)] += 1
+        self.waits.extend(now - prepared.timestamp for prepared in frames if prepared.timestamp is not None)
+
+    def stats(self):
+        waits = np.array(self.waits) * 1000
+        return {
+            "forwards": self.forwards,
+            "frames": self.frames,
+            "mean_batch": self.frames / self.forwards if self.forwards else 0.0,
+            "batch_sizes": dict(sorted(self.sizes.items())),
+            "queue_wait_ms": {
+                "p50": float(np.percentile(waits, 50)),
+                "p95": float(np.percentile(waits, 95)),
+                "max": float(waits.max()),
+            } if len(waits) else None,
+        }
+
+def predict_batch(detector, frames, batch_stats=None):
+    # Un solo forward para todos los frames; devuelve las predicciones en el mismo orden
+    # y la parte de la latencia que le toca a cada frame
+    if batch_stats is not None:
+        batch_stats.record(frames)
+
+    start = time.perf_counter()
+    tensor = torch.cat([prepared.tensor for prepared in frames])
+    predictions = detector._predict(tensor)
+    return predictions, (time.perf_counter() - start) / len(frames)
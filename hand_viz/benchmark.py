@@ -0,0 +1,352 @@
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from batching import BatchStats, predict_batch
+from frame_buffer import BUFFER_SIZE, FrameRingBuffer
+from model_backend import BACKENDS, load_model
+from motion_gate import MAX_STALENESS
+from preprocessing import PreparedFrame
+from threads import DetectionThread, HandsThread
+from threads.detection_thread import MAX_STRIDE
+
+MODELS_DIR = os.path.join("./models")
+MODEL_PATHS = {
+    "controller": f"{MODELS_DIR}/controller_model.pt",
+    "hands": f"{MODELS_DIR}/hand_model.pt",
+}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+STAGES = ("capture", "preprocess", "inference", "tracking", "follow", "stability", "landmarks")
+WARMUP_FRAMES = 5 # Los primeros frames incluyen la carga perezosa del modelo
+
+class StageTimes:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.samples = {stage: [] for stage in STAGES}
+
+    def add(self, stage, seconds):
+        self.samples[stage].append(seconds)
+
+    def summary(self):
+        summary = {}
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            ms = np.array(samples) * 1000
+            summary[stage] = {
+                "count": len(ms),
+                "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p90_ms": float(np.percentile(ms, 90)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "max_ms": float(ms.max()),
+            }
+        return summary
+
+class BenchmarkDetectionThread(DetectionThread):
+    """DetectionThread real con cronometros alrededor de cada etapa."""
+
+    def __init__(self, *args, stage_times, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stage_times = stage_times
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.frames = 0
+        self.inferences = 0
+        self.follows = 0
+        # Fin del warmup: las decisiones del scheduler y del motion gate tambien se cuentan desde cero
+        self.scheduler.reset_stats()
+        if self.motion_gate is not None:
+            self.motion_gate.reset_stats()
+
+    def model_input(self, prepared):
+        # La misma entrada que en vivo (frame completo o recorte ROI). El letterbox del frame
+        # completo es compartido: lo paga el primer modelo que lo pide en el frame
+        model_input = super().model_input(prepared)
+        if "_letterbox" not in model_input.__dict__:
+            start = time.perf_counter()
+            model_input.tensor
+            self.stage_times.add("preprocess", time.perf_counter() - start)
+        return model_input
+
+    def finish_inference(self, has_detections, latency):
+        self.inferences += 1
+        super().finish_inference(has_detections, latency)
+
+    def _predict(self, tensor):
+        start = time.perf_counter()
+        inference = super()._predict(tensor)
+        self.stage_times.add("inference", time.perf_counter() - start)
+        return inference
+
+    def _track(self, prediction, frame, model_input):
+        start = time.perf_counter()
+        has_tracks = super()._track(prediction, frame, model_input)
+        self.stage_times.add("tracking", time.perf_counter() - start)
+        return has_tracks
+
+    def _make_following(self, frame):
+        start = time.perf_counter()
+        super()._make_following(frame)
+        self.follows += 1
+        self.stage_times.add("follow", time.perf_counter() - start)
+
+    def _check_stability_with(self, prev_state, curr_state):
+        start = time.perf_counter()
+        stable = super()._check_stability_with(prev_state, curr_state)
+        self.stage_times.add("stability", time.perf_counter() - start)
+        return stable
+
+    def begin_step(self, prepared):
+        self.frames += 1
+        return super().begin_step(prepared)
+
+class BenchmarkHandsThread(HandsThread):
+    """HandsThread de MediaPipe (modo VIDEO) cronometrado, para compararlo con hand_model.pt."""
+
+    def __init__(self, *args, stage_times, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stage_times = stage_times
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.frames = 0
+        self.inferences = 0
+        self.follows = 0
+        self.dropped = 0
+
+    def step(self, prepared):
+        # Conversion a RGB + HandLandmarker: MediaPipe no separa preproceso de inferencia
+        start = time.perf_counter()
+        cooldown = super().step(prepared)
+        self.stage_times.add("landmarks", time.perf_counter() - start)
+        return cooldown
+
+class BenchmarkContext:
+    """Contexto minimo de JoystickDetector, sin camara ni ventana de cv2."""
+
+    def __init__(self, target_fps, batch=1):
+        self.stop_event = threading.Event()
+        # Un batch offline tiene que entrar entero en el buffer
+        self.frame_buffer = FrameRingBuffer(size=max(BUFFER_SIZE, batch + 1))
+        self.frame_time = 1.0 / target_fps
+        self.mutex = {}
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set()
+
+def read_frames(source, frame_buffer):
+    # Mismo camino que CameraThread: leemos directo sobre el slot libre del buffer
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, "*")) if p.lower().endswith(IMAGE_EXTENSIONS))
+        for path in paths:
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield frame_buffer.write(frame)
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise SystemExit(f"No se pudo abrir {source}")
+    try:
+        while True:
+            ret, frame = cap.read(frame_buffer.next_slot())
+            if not ret:
+                break
+            yield frame_buffer.write(frame)
+    finally:
+        cap.release()
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def step_batched(detector, chunk, resume_frame, frame_time, batch_stats):
+    # Frames consecutivos en un solo forward; el tracker se actualiza despues, frame por frame y en orden
+    frames = [prepared for prepared in chunk if prepared.frame_id >= resume_frame[detector.thread_name]]
+    if not frames:
+        return
+
+    # Con ROI, el recorte sale del control ya procesado para todo el batch
+    inputs = [detector.model_input(prepared) for prepared in frames]
+    predictions, forward_latency = predict_batch(detector, inputs, batch_stats)
+    for prepared, model_input, prediction in zip(frames, inputs, predictions):
+        # Un backoff que arranca a mitad del batch descarta el resto, como un frame salteado en vivo
+        if prepared.frame_id < resume_frame[detector.thread_name]:
+            continue
+
+        # El motion gate puede reusar el resultado anterior: la prediccion del batch se descarta
+        if detector.begin_step(prepared):
+            detector.apply_inference(prepared, model_input, prediction, forward_latency)
+        cooldown = detector.end_step(prepared)
+        resume_frame[detector.thread_name] = prepared.frame_id + int(round(cooldown / frame_time))
+
+def run_benchmark(source, backend="torch", target_fps=30, max_frames=None, warmup=WARMUP_FRAMES, batch=1, hands_roi=False, motion_gate=False, max_staleness=MAX_STALENESS, smooth_keypoints=False, hand_engine="yolo"):
+    if hand_engine == "mediapipe" and (batch > 1 or hands_roi):
+        raise SystemExit("MediaPipe procesa de a un frame completo: sin --batch ni --hands-roi")
+
+    context = BenchmarkContext(target_fps, batch)
+    stage_times = StageTimes()
+
+    # En batch offline todos los frames van a inferencia completa: el seguimiento con Kalman
+    # depende del frame anterior y no se puede adelantar dentro del batch
+    max_stride = 1 if batch > 1 else MAX_STRIDE
+
+    # onnx/openvino se exportan con el batch fijo del forward
+    detectors = [
+        BenchmarkDetectionThread(
+            context, model_path, name,
+            max_stride=max_stride,
+            motion_gate=motion_gate,
+            max_staleness=max_staleness,
+            smooth_keypoints=smooth_keypoints,
+            model=load_model(model_path, backend, batch=batch),
+            stage_times=stage_times
+        )
+        for name, model_path in MODEL_PATHS.items()
+        if name != "hands" or hand_engine == "yolo"
+    ]
+    if hand_engine == "mediapipe":
+        detectors.append(BenchmarkHandsThread(context, mode="video", stage_times=stage_times))
+    if hands_roi:
+        detectors[1].roi_source = detectors[0]
+    batch_stats = {detector.thread_name: BatchStats() for detector in detectors}
+
+    # Igual que InferenceThread: los modelos YOLO se reparten el presupuesto del frame
+    yolo_detectors = [detector for detector in detectors if isinstance(detector, DetectionThread)]
+    for detector in yolo_detectors:
+        detector.scheduler.frame_time = context.frame_time / len(yolo_detectors)
+    resume_frame = {detector.thread_name: 0 for detector in detectors}
+
+    frames = -warmup
+    frame_ids = read_frames(source, context.frame_buffer)
+    while max_frames is None or frames < max_frames:
+        if frames == 0:
+            # Fin del warmup: medimos desde aca
+            stage_times.reset()
+            for detector in detectors:
+                detector.reset_counters()
+            batch_stats = {detector.thread_name: BatchStats() for detector in detectors}
+            usage_start = resource.getrusage(resource.RUSAGE_SELF)
+            wall_start = time.perf_counter()
+
+        # El batch no cruza el fin del warmup ni max_frames
+        size = batch if frames >= 0 else min(batch, -frames)
+        if max_frames is not None and frames >= 0:
+            size = min(size, max_frames - frames)
+
+        chunk = []
+        for _ in range(size):
+            start = time.perf_counter()
+            frame_id = next(frame_ids, None)
+            if frame_id is None:
+                break
+            stage_times.add("capture", time.perf_counter() - start)
+            frames += 1
+            chunk.append(PreparedFrame(context.frame_buffer.get(frame_id), frame_id, timestamp=time.monotonic()))
+        if not chunk:
+            break
+
+        if batch > 1:
+            for prepared in chunk:
+                start = time.perf_counter()
+                prepared.tensor
+                stage_times.add("preprocess", time.perf_counter() - start)
+
+            for detector in detectors:
+                step_batched(detector, chunk, resume_frame, context.frame_time, batch_stats[detector.thread_name])
+            continue
+
+        prepared = chunk[0]
+        for detector in detectors:
+            # El backoff sin detecciones se mide en frames del video, no en tiempo real
+            if prepared.frame_id < resume_frame[detector.thread_name]:
+                continue
+            cooldown = detector.step(prepared)
+            resume_frame[detector.thread_name] = prepared.frame_id + int(round(cooldown / context.frame_time))
+
+    if frames <= 0:
+        raise SystemExit(f"{source} no tiene frames suficientes (warmup de {warmup})")
+
+    wall = time.perf_counter() - wall_start
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+    user = usage_end.ru_utime - usage_start.ru_utime
+    system = usage_end.ru_stime - usage_start.ru_stime
+
+    return {
+        "commit": git_commit(),
+        "source": source,
+        "backend": backend,
+        "target_fps": target_fps,
+        "warmup_frames": warmup,
+        "batch": batch,
+        "hands_roi": hands_roi,
+        "motion_gate": motion_gate,
+        "hand_engine": hand_engine,
+        "frames": frames,
+        "wall_s": wall,
+        "fps": frames / wall if wall else 0.0,
+        "cpu": {
+            "user_s": user,
+            "system_s": system,
+            # Nucleos usados en promedio (1.0 = un nucleo completo)
+            "cores": (user + system) / wall if wall else 0.0,
+        },
+        "stages": stage_times.summary(),
+        "batching": {name: stats.stats() for name, stats in batch_stats.items()} if batch > 1 else None,
+        "models": {
+            detector.thread_name: {
+                "frames": detector.frames,
+                "inferences": detector.inferences,
+                "follows": detector.follows,
+                "fps": detector.frames / wall if wall else 0.0,
+                "inferences_per_s": detector.inferences / wall if wall else 0.0,
+                "scheduler": detector.scheduler_stats(),
+            }
+            for detector in detectors
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless del pipeline de hand_viz sobre video o imagenes grabadas")
+    parser.add_argument("source", help="Archivo de video o carpeta de imagenes")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    parser.add_argument("--target-fps", type=int, default=30)
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--warmup", type=int, default=WARMUP_FRAMES)
+    parser.add_argument("--hands-roi", action="store_true", help="Manos sobre un recorte alrededor del control")
+    parser.add_argument("--motion-gate", action="store_true", help="Reusa resultados mientras la escena no se mueva")
+    parser.add_argument("--max-staleness", type=int, default=MAX_STALENESS)
+    parser.add_argument("--smooth-keypoints", action="store_true", help="One-Euro por track en los keypoints")
+    parser.add_argument("--hand-engine", choices=["yolo", "mediapipe"], default="yolo",
+                        help="hand_model.pt o HandLandmarker de MediaPipe en modo VIDEO (models/hand_landmarker.task)")
+    parser.add_argument("--batch", type=int, default=1,
+                        help="Frames consecutivos por forward (solo inferencia completa, sin Kalman)")
+    parser.add_argument("--output", default=None, help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.source, args.backend, args.target_fps, args.max_frames, args.warmup, args.batch, args.hands_roi, args.motion_gate, args.max_staleness, args.smooth_keypoints, args.hand_engine)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"{report['frames']} frames a {report['fps']:.1f} FPS, reporte en {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
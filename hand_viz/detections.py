@@ -0,0 +1,46 @@
+import numpy as np
+
+class Detections:
+    """Resultado compacto de un detector para un frame, solo arrays NumPy.
+
+    A diferencia de ultralytics Results no guarda el frame (orig_img) ni tensores:
+    un resultado viejo no retiene frames en memoria y cruza hilos/procesos barato.
+    """
+
+    __slots__ = ("frame_id", "timestamp", "boxes", "classes", "confidences", "track_ids", "keypoints")
+
+    def __init__(self, boxes=None, classes=None, confidences=None, track_ids=None, keypoints=None, frame_id=None, timestamp=None):
+        n = 0 if boxes is None else len(boxes)
+
+        self.frame_id = frame_id
+        self.timestamp = timestamp # time.monotonic() de la captura
+        self.boxes = np.zeros((0, 4), dtype=np.float32) if boxes is None else np.asarray(boxes, dtype=np.float32).reshape(n, 4)
+        self.classes = np.zeros(n, dtype=np.int32) if classes is None else np.asarray(classes, dtype=np.int32)
+        self.confidences = np.zeros(n, dtype=np.float32) if confidences is None else np.asarray(confidences, dtype=np.float32)
+        self.track_ids = np.full(n, -1, dtype=np.int32) if track_ids is None else np.asarray(track_ids, dtype=np.int32)
+        # (N, K, 3): x, y, confianza en pixeles del frame completo; None para modelos sin pose
+        self.keypoints = None if keypoints is None else np.asarray(keypoints, dtype=np.float32)
+
+    @classmethod
+    def from_tracks(cls, tracks, keypoints=None):
+        # Filas de BYTETracker.update: x1, y1, x2, y2, track_id, score, cls, idx
+        tracks = np.asarray(tracks).reshape(-1, 8)
+        return cls(
+            boxes=tracks[:, :4],
+            classes=tracks[:, 6],
+            confidences=tracks[:, 5],
+            track_ids=tracks[:, 4],
+            keypoints=keypoints
+        )
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def for_frame(self, frame_id, timestamp=None):
+        # Un resultado sin frame se completa en el lugar; uno ya publicado se copia (comparte los arrays)
+        if self.frame_id is None:
+            self.frame_id = frame_id
+            self.timestamp = timestamp
+            return self
+
+        return Detections(self.boxes, self.classes, self.confidences, self.track_ids, self.keypoints, frame_id, timestamp)
@@ -0,0 +1,117 @@
+import threading
+import time
+import numpy as np
+
+BUFFER_SIZE = 8
+
+class FrameRingBuffer:
+    """Frames de camara preasignados e indexados por un numero de secuencia creciente.
+
+    Los lectores reciben vistas de solo lectura (sin copia). El slot que sigue al
+    ultimo frame es el proximo en escribirse, por eso solo quedan disponibles los
+    ultimos size - 1 frames. Una vista vale mientras su frame siga en el buffer
+    (size - 1 frames, ~230 ms a 30 FPS): quien la lee confirma con still_valid()
+    despues de usarla y descarta el resultado si la camara ya piso el slot.
+    """
+
+    def __init__(self, size=BUFFER_SIZE, shape=None, dtype=np.uint8, condition=None):
+        # Varias fuentes pueden compartir la condicion para esperar "cualquier frame nuevo"
+        self.new_frame = condition if condition is not None else threading.Condition(threading.Lock())
+        self.lock = self.new_frame
+        self.closed = False
+        self.size = size
+        self.dtype = dtype
+        self.frames = None if shape is None else np.zeros((size,) + tuple(shape), dtype=dtype)
+        self.seqs = np.zeros(size, dtype=np.int64)
+        self.stamps = np.zeros(size)
+        self.seq = 0
+
+    def next_slot(self):
+        # Slot donde puede escribir la camara directamente (cap.read(image=slot))
+        if self.frames is None:
+            return None
+        return self.frames[(self.seq + 1) % self.size]
+
+    def write(self, frame):
+        seq = self.seq + 1
+        slot = seq % self.size
+
+        if self.frames is None or self.frames.shape[1:] != frame.shape:
+            with self.lock:
+                self.frames = np.zeros((self.size,) + frame.shape, dtype=self.dtype)
+                self.seqs[:] = 0
+
+        # Si la camara ya escribio en el slot no hace falta copiar
+        if not np.may_share_memory(frame, self.frames[slot]):
+            np.copyto(self.frames[slot], frame)
+
+        with self.lock:
+            self.seqs[slot] = seq
+            self.stamps[slot] = time.monotonic()
+            self.seq = seq
+            # Despertamos a los detectores que esperan el frame N
+            self.new_frame.notify_all()
+
+        return seq
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.new_frame.notify_all()
+
+    def _view(self, seq):
+        view = self.frames[seq % self.size]
+        view.flags.writeable = False
+        return view
+
+    def _is_available(self, seq):
+        return 0 < seq <= self.seq and self.seq - seq < self.size - 1 and self.seqs[seq % self.size] == seq
+
+    def get(self, seq):
+        with self.lock:
+            if seq is None or not self._is_available(seq):
+                return None
+            return self._view(seq)
+
+    def still_valid(self, seq):
+        # True si la vista de seq no se sobrescribio (se llama despues de leer sus pixeles)
+        with self.lock:
+            return seq is not None and bool(self._is_available(seq))
+
+    def write_time(self, seq):
+        # time.monotonic() de cuando se publico el frame, None si ya no esta en el buffer
+        with self.lock:
+            if not self._is_available(seq):
+                return None
+            return float(self.stamps[seq % self.size])
+
+    def latest(self):
+        with self.lock:
+            if self.seq == 0:
+                return 0, None
+            return self.seq, self._view(self.seq)
+
+    def latest_after(self, seq):
+        # Devuelve el ultimo frame solo si es posterior a seq (evita reprocesar el mismo frame)
+        with self.lock:
+            if self.seq <= seq:
+                return seq, None
+            return self.seq, self._view(self.seq)
+
+    def wait_after(self, seq, timeout=None):
+        # Bloquea hasta que haya un frame posterior a seq, se cierre el buffer o venza el timeout
+        with self.lock:
+            self.new_frame.wait_for(lambda: self.seq > seq or self.closed, timeout)
+            if self.seq <= seq:
+                return seq, None
+            return self.seq, self._view(self.seq)
+
+def wait_any(buffers, seqs, condition, timeout=None, count=1):
+    # Bloquea hasta que al menos count buffers (todos con la misma condicion) tengan un frame posterior a su seq
+    def ready():
+        if any(b.closed for b in buffers):
+            return True
+        return sum(b.seq > seq for b, seq in zip(buffers, seqs)) >= count
+
+    with condition:
+        return condition.wait_for(ready, timeout)
@@ -0,0 +1,197 @@
+import numpy as np
+
+# Misma taxonomia que capture_hands_2/event_handler.py (nombres de los directorios de captura)
+POINT_ZONES = ("button_A", "button_B", "button_X", "button_Y", "bumper_L", "bumper_R", "trigger_L", "trigger_R")
+DIRECTION_ZONES = ("stick_left", "stick_right", "dpad", "buttons")
+ZONES = POINT_ZONES + DIRECTION_ZONES
+
+# Gatillos y bumpers: dos a la vez se reportan como combo (combo_L1_R2, ...)
+SHOULDERS = {"bumper_L": "L1", "trigger_L": "L2", "bumper_R": "R1", "trigger_R": "R2"}
+SHOULDER_ORDER = ("L1", "L2", "R1", "R2")
+
+# (x, y) -> direccion, con y hacia abajo como en la imagen (y en los ejes del joystick)
+STICK_DIRECTIONS = {
+    (1, 0): "right",
+    (-1, 0): "left",
+    (0, -1): "up",
+    (0, 1): "down",
+    (1, -1): "up_right",
+    (-1, -1): "up_left",
+    (1, 1): "down_right",
+    (-1, 1): "down_left"
+}
+# Zona "buttons" (los cuatro botones en una sola caja): la posicion elige el boton
+FACE_BUTTONS = {"up": "button_Y", "down": "button_A", "left": "button_X", "right": "button_B"}
+
+FINGERTIPS = (4, 8, 12, 16, 20) # Pulgar, indice, medio, anular, menique (orden MediaPipe)
+KEYPOINT_CONF = 0.5
+DEBOUNCE_FRAMES = 2 # Frames seguidos para presionar / soltar
+HYSTERESIS = 0.15 # Una zona presionada se suelta recien fuera de su caja agrandada este tanto
+STICK_DEADZONE = 0.35 # Desplazamiento desde el centro (fraccion de media caja) para salir de neutral
+STICK_RELEASE = 0.25 # ... y para volver a neutral
+
+class InputEvent:
+    __slots__ = ("label", "pressed", "frame_id", "timestamp")
+
+    def __init__(self, label, pressed, frame_id=None, timestamp=None):
+        self.label = label
+        self.pressed = pressed
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"InputEvent({self.label}, {'down' if self.pressed else 'up'}, frame={self.frame_id})"
+
+class InputMapper:
+    """Traduce keypoints de manos + zonas del control a entradas del joystick.
+
+    Por frame: la mejor caja de cada zona, las puntas de los dedos con confianza y un
+    test punta-en-caja vectorizado (puntas x zonas). Las zonas puntuales (botones,
+    gatillos) se presionan con un dedo adentro; en sticks, dpad y "buttons" la posicion
+    del dedo respecto del centro da la direccion. Cada etiqueta pasa por histeresis
+    (caja agrandada / zona muerta menor para soltar) y debounce antes de emitir eventos.
+    """
+
+    def __init__(self, controller_names, zone_classes=None, fingertips=FINGERTIPS, keypoint_conf=KEYPOINT_CONF,
+                 debounce=DEBOUNCE_FRAMES, hysteresis=HYSTERESIS, deadzone=STICK_DEADZONE, release=STICK_RELEASE):
+        # zone_classes: zona -> nombre de clase del detector de control (por defecto el mismo nombre)
+        zone_classes = zone_classes or {zone: zone for zone in ZONES}
+        class_ids = {name: class_id for class_id, name in controller_names.items()}
+
+        self.zones = [zone for zone in ZONES if zone_classes.get(zone) in class_ids]
+        self.zone_class = np.array([class_ids[zone_classes[zone]] for zone in self.zones], dtype=np.int32)
+        self.point = np.array([zone in POINT_ZONES for zone in self.zones], dtype=bool)
+
+        self.fingertips = np.asarray(fingertips)
+        self.keypoint_conf = keypoint_conf
+        self.debounce = debounce
+        self.hysteresis = hysteresis
+        self.deadzone = deadzone
+        self.release = release
+
+        self.engaged = np.zeros(len(self.zones), dtype=bool) # Zonas con un dedo adentro el frame anterior
+        self.directions = np.zeros((len(self.zones), 2), dtype=np.int8) # Ultima direccion por zona
+        self.active = set() # Etiquetas presionadas (con debounce)
+        self.streak = {} # Etiqueta -> frames seguidos en el estado contrario al actual
+
+    def _zone_boxes(self, controller):
+        # Caja de mayor confianza de cada zona; NaN si la zona no se detecto
+        boxes = np.full((len(self.zones), 4), np.nan, dtype=np.float32)
+        if controller is None or len(controller) == 0:
+            return boxes
+
+        order = np.argsort(-controller.confidences)
+        classes, first = np.unique(controller.classes[order], return_index=True)
+        best = controller.boxes[order[first]]
+
+        index = np.searchsorted(classes, self.zone_class)
+        index = np.minimum(index, len(classes) - 1)
+        found = classes[index] == self.zone_class
+        boxes[found] = best[index[found]]
+        return boxes
+
+    def _tips(self, hands):
+        keypoints = hands.keypoints[:, self.fingertips]
+        return keypoints[..., :2][keypoints[..., 2] > self.keypoint_conf]
+
+    def _directions(self, offsets, inside):
+        # Direccion (x, y) en {-1, 0, 1} con zona muerta e histeresis por eje
+        threshold = np.where(self.directions != 0, self.release, self.deadzone)
+        directions = np.sign(offsets).astype(np.int8) * (np.abs(offsets) > threshold)
+        directions[~inside] = 0
+        return directions
+
+    def labels(self, controller, hands):
+        # Etiquetas crudas (sin debounce) de un frame
+        if not len(self.zones) or hands is None or hands.keypoints is None or len(hands) == 0:
+            self.engaged[:] = False
+            self.directions[:] = 0
+            return set()
+
+        boxes = self._zone_boxes(controller)
+        tips = self._tips(hands)
+
+        # Zonas ya presionadas se sueltan con la caja agrandada
+        size = boxes[:, 2:] - boxes[:, :2]
+        margin = (size * self.hysteresis * self.engaged[:, None])
+        low, high = boxes[:, :2] - margin, boxes[:, 2:] + margin
+
+        # (P, Z): que punta esta en que zona; NaN (zona no detectada) da False
+        inside = np.all((tips[:, None, :] >= low[None]) & (tips[:, None, :] <= high[None]), axis=2)
+        engaged = inside.any(axis=0)
+
+        # Direcciones: la punta mas cercana al centro de cada zona, normalizada a [-1, 1]
+        center = (boxes[:, :2] + boxes[:, 2:]) / 2
+        half = np.maximum(size / 2, 1e-6)
+        offsets = (tips[:, None, :] - center[None]) / half[None]
+        distance = np.where(inside, np.abs(offsets).max(axis=2), np.inf)
+        nearest = offsets[distance.argmin(axis=0), np.arange(len(self.zones))] if len(tips) else np.zeros((len(self.zones), 2))
+        nearest = np.nan_to_num(nearest)
+        directions = self._directions(nearest, engaged & ~self.point)
+
+        self.engaged = engaged
+        self.directions = directions
+
+        labels = set()
+        shoulders = []
+        for zone, is_engaged, is_point, (x, y), (dx, dy) in zip(self.zones, engaged.tolist(), self.point.tolist(), directions.tolist(), np.abs(nearest).tolist()):
+            if not is_engaged:
+                continue
+
+            if is_point:
+                if zone in SHOULDERS:
+                    shoulders.append(SHOULDERS[zone])
+                else:
+                    labels.add(zone)
+                continue
+
+            if (x, y) not in STICK_DIRECTIONS:
+                # Neutral: no es una entrada
+                continue
+
+            if zone == "dpad" or zone == "buttons":
+                # Cuatro direcciones: en diagonal gana el eje con mayor desplazamiento
+                if x and y:
+                    x, y = (x, 0) if dx >= dy else (0, y)
+                direction = STICK_DIRECTIONS[(x, y)]
+                labels.add(f"dpad_{direction}" if zone == "dpad" else FACE_BUTTONS[direction])
+            else:
+                labels.add(f"{zone}_{STICK_DIRECTIONS[(x, y)]}")
+
+        if len(shoulders) >= 2:
+            first, second = sorted(shoulders, key=SHOULDER_ORDER.index)[:2]
+            labels.add(f"combo_{first}_{second}")
+        elif shoulders:
+            labels.add(next(zone for zone, name in SHOULDERS.items() if name == shoulders[0]))
+
+        return labels
+
+    def update(self, controller, hands):
+        # -> lista de InputEvent (presionado / soltado) de este frame
+        if hands is not None and hands.keypoints is None:
+            # Frame de seguimiento (Kalman) sin keypoints: mantenemos el estado
+            return []
+
+        labels = self.labels(controller, hands)
+        frame_id = None if hands is None else hands.frame_id
+        timestamp = None if hands is None else hands.timestamp
+
+        # Trabajamos sobre una copia: el renderer lee active desde otro hilo
+        active = set(self.active)
+        events = []
+        for label in labels | active | set(self.streak):
+            # La etiqueta esta en el estado contrario al publicado: acumulamos frames
+            if (label in labels) != (label in active):
+                self.streak[label] = self.streak.get(label, 0) + 1
+                if self.streak[label] < self.debounce:
+                    continue
+                pressed = label in labels
+                if pressed:
+                    active.add(label)
+                else:
+                    active.discard(label)
+                events.append(InputEvent(label, pressed, frame_id, timestamp))
+            self.streak.pop(label, None)
+
+        self.active = active
+        return events
@@ -0,0 +1,122 @@
+import time
+
+import numpy as np
+
+MIN_CUTOFF = 1.5 # Hz: suavizado con la mano quieta (menor = menos jitter, mas retraso)
+BETA = 0.01 # Cuanto sube el corte con la velocidad (px/s): con la mano en movimiento casi no hay retraso
+D_CUTOFF = 1.0 # Hz: suavizado de la velocidad
+MAX_AGE = 1.0 # Segundos que se guarda el estado de un track que dejo de verse
+MIN_DT = 1e-3
+
+def smoothing_factor(dt, cutoff):
+    tau = 1.0 / (2 * np.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+class KeypointFilter:
+    """Filtro One-Euro por track_id y por landmark, vectorizado sobre todos los tracks.
+
+    update() filtra los keypoints de una inferencia y guarda, por track, los keypoints
+    relativos a su caja. predict() los lleva a las cajas que predice el Kalman de
+    ByteTrack en los frames de seguimiento, que no pasan por el modelo.
+    """
+
+    def __init__(self, min_cutoff=MIN_CUTOFF, beta=BETA, d_cutoff=D_CUTOFF, max_age=MAX_AGE):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.max_age = max_age
+
+        # Estado por track (T,): ids, ultima actualizacion, caja (centro, tamano) y keypoints filtrados
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.times = np.zeros(0)
+        self.centers = np.zeros((0, 2), dtype=np.float32)
+        self.sizes = np.zeros((0, 2), dtype=np.float32)
+        self.points = None # (T, K, 2)
+        self.velocities = None # (T, K, 2) px/s
+        self.confidences = None # (T, K)
+
+    def _lookup(self, ids):
+        # Indice en el estado de cada id y si existe
+        if len(self.ids) == 0:
+            return np.zeros(len(ids), dtype=int), np.zeros(len(ids), dtype=bool)
+
+        order = np.argsort(self.ids)
+        position = np.minimum(np.searchsorted(self.ids[order], ids), len(order) - 1)
+        index = order[position]
+        return index, self.ids[index] == ids
+
+    @staticmethod
+    def _box_frame(boxes):
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        sizes = np.maximum(boxes[:, 2:] - boxes[:, :2], 1.0)
+        return centers.astype(np.float32), sizes.astype(np.float32)
+
+    def update(self, ids, boxes, keypoints, timestamp=None):
+        # keypoints (N, K, 3) de los tracks ids con cajas boxes (N, 4) -> keypoints filtrados
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        ids = np.asarray(ids, dtype=np.int64)
+        keypoints = np.array(keypoints, dtype=np.float32)
+        if self.points is not None and self.points.shape[1] != keypoints.shape[1]:
+            self.reset()
+
+        points = keypoints[..., :2]
+        velocities = np.zeros_like(points)
+        index, found = self._lookup(ids)
+
+        if found.any():
+            i = index[found]
+            dt = np.maximum(timestamp - self.times[i], MIN_DT)[:, None, None]
+            previous = self.points[i]
+
+            # Velocidad suavizada; el corte de la posicion sube con ella (poco retraso en movimiento)
+            raw = (points[found] - previous) / dt
+            a_d = smoothing_factor(dt, self.d_cutoff)
+            velocity = a_d * raw + (1 - a_d) * self.velocities[i]
+            cutoff = self.min_cutoff + self.beta * np.linalg.norm(velocity, axis=2, keepdims=True)
+            a = smoothing_factor(dt, cutoff)
+
+            points[found] = a * points[found] + (1 - a) * previous
+            velocities[found] = velocity
+
+        centers, sizes = self._box_frame(np.asarray(boxes, dtype=np.float32))
+
+        # Tracks que no vinieron en esta inferencia (perdidos un momento) conservan su estado
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[index[found]] = False
+        keep &= timestamp - self.times <= self.max_age
+
+        self.ids = np.concatenate((self.ids[keep], ids))
+        self.times = np.concatenate((self.times[keep], np.full(len(ids), timestamp)))
+        self.centers = np.concatenate((self.centers[keep], centers))
+        self.sizes = np.concatenate((self.sizes[keep], sizes))
+        if self.points is None:
+            self.points, self.velocities, self.confidences = points.copy(), velocities, keypoints[..., 2].copy()
+        else:
+            self.points = np.concatenate((self.points[keep], points))
+            self.velocities = np.concatenate((self.velocities[keep], velocities))
+            self.confidences = np.concatenate((self.confidences[keep], keypoints[..., 2]))
+
+        return keypoints
+
+    def predict(self, ids, boxes):
+        # Keypoints en las cajas del Kalman (misma posicion relativa y escala); confianza 0 sin estado
+        if self.points is None:
+            return None
+
+        ids = np.asarray(ids, dtype=np.int64)
+        keypoints = np.zeros((len(ids),) + self.points.shape[1:2] + (3,), dtype=np.float32)
+        index, found = self._lookup(ids)
+        if not found.any():
+            return keypoints
+
+        i = index[found]
+        centers, sizes = self._box_frame(np.asarray(boxes, dtype=np.float32)[found])
+        scale = (sizes / self.sizes[i])[:, None, :]
+        keypoints[found, :, :2] = centers[:, None, :] + (self.points[i] - self.centers[i][:, None, :]) * scale
+        keypoints[found, :, 2] = self.confidences[i]
+        return keypoints
+
+    def reset(self):
+        self.__init__(self.min_cutoff, self.beta, self.d_cutoff, self.max_age)
@@ -0,0 +1,74 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+from ultralytics import YOLO
+
+from preprocessing import IMGSZ
+
+BACKENDS = ("torch", "onnx", "openvino", "onnx_int8")
+# Paquetes de requirements.txt que necesita cada backend ademas de ultralytics
+BACKEND_MODULES = {"onnx": ("onnx", "onnxruntime"), "openvino": ("openvino",), "onnx_int8": ("onnxruntime",)}
+
+def exported_path(model_path, backend, batch=1):
+    # Los artefactos exportados quedan al lado del .pt, con los nombres que usa ultralytics
+    root, _ = os.path.splitext(model_path)
+    if batch > 1 and backend in ("onnx", "openvino"):
+        root = f"{root}_b{batch}"
+    if backend == "onnx":
+        return f"{root}.onnx"
+    if backend == "openvino":
+        return f"{root}_openvino_model"
+    if backend == "onnx_int8":
+        return f"{root}_int8.onnx"
+    return model_path
+
+def _is_stale(path, model_path):
+    return not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(model_path)
+
+def _export_batched(model_path, backend, imgsz, batch, path):
+    # ultralytics exporta siempre con el nombre del .pt: exportamos desde una copia
+    # para no pisar el artefacto de batch 1
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_model = os.path.join(tmp, os.path.basename(model_path))
+        shutil.copy2(model_path, tmp_model)
+        exported = YOLO(tmp_model).export(format=backend, imgsz=imgsz, batch=batch, dynamic=False, half=False, verbose=False)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        shutil.move(exported, path)
+    return path
+
+def export_model(model, model_path, backend, imgsz=IMGSZ, batch=1):
+    path = exported_path(model_path, backend, batch)
+    if _is_stale(path, model_path):
+        print(f"Exportando {model_path} a {backend} (imgsz={imgsz}, batch={batch})...")
+        if batch > 1:
+            # Batch fijo: ultralytics rellena los batches incompletos y parte los mas grandes
+            return _export_batched(model_path, backend, imgsz, batch, path)
+        # Forma de entrada fija: el letterbox siempre entrega 1x3ximgszximgsz
+        path = model.export(format=backend, imgsz=imgsz, dynamic=False, half=False, verbose=False)
+    return path
+
+def load_model(model_path, backend="torch", imgsz=IMGSZ, batch=1):
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {backend}. Opciones: {', '.join(BACKENDS)}")
+
+    # Sin esto ultralytics intenta instalarlos con pip en medio de la ejecucion
+    missing = [m for m in BACKEND_MODULES.get(backend, ()) if importlib.util.find_spec(m) is None]
+    if missing:
+        raise ImportError(f"El backend {backend} necesita {', '.join(missing)}: pip install -r requirements.txt")
+
+    model = YOLO(model_path)
+    if backend == "torch":
+        return model
+
+    if backend == "onnx_int8":
+        # El INT8 necesita calibrarse con capturas reales, no se genera al vuelo (siempre batch 1)
+        path = exported_path(model_path, backend)
+        if _is_stale(path, model_path):
+            raise FileNotFoundError(f"No existe {path} o es anterior al .pt; generalo con: python quantize.py")
+    else:
+        path = export_model(model, model_path, backend, imgsz, batch)
+
+    # El .pt define la tarea (detect/pose): el modelo exportado no siempre la trae en el nombre
+    return YOLO(path, task=model.task)
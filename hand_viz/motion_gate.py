@@ -0,0 +1,78 @@
+import cv2
+
+MOTION_SCALE = 8 # 640x480 -> 80x60
+BLOCK_SIZE = 10 # Bloques de la miniatura para el SAD (10x10 -> 80x80 px del frame)
+DIFF_THRESH = 6.0 # Diferencia media por pixel (0-255) que cuenta como movimiento en un bloque
+MAX_STALENESS = 15 # Frames seguidos reusando resultados antes de forzar una inferencia
+
+def motion_thumbnail(frame, scale=MOTION_SCALE):
+    # Gris y promediado por area: el ruido del sensor se cancela al achicar
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    return cv2.resize(gray, (w // scale, h // scale), interpolation=cv2.INTER_AREA)
+
+class MotionGate:
+    """Compara cada frame contra el ultimo inferido con un SAD por bloques sobre una miniatura.
+
+    Si ningun bloque se movio, el detector reusa los resultados anteriores en lugar de
+    correr YOLO; a lo sumo max_staleness frames seguidos.
+    """
+
+    def __init__(self, max_staleness=MAX_STALENESS, threshold=DIFF_THRESH, block_size=BLOCK_SIZE):
+        self.max_staleness = max_staleness
+        self.threshold = threshold
+        self.block_size = block_size
+
+        self.reference = None
+        self.staleness = 0
+
+        self.reused = 0
+        self.moved = 0
+        self.stale = 0
+
+    def _max_block_diff(self, thumbnail):
+        diff = cv2.absdiff(thumbnail, self.reference)
+        b = self.block_size
+        h, w = (diff.shape[0] // b) * b, (diff.shape[1] // b) * b
+        if h == 0 or w == 0:
+            return float(diff.mean())
+
+        blocks = diff[:h, :w].reshape(h // b, b, w // b, b).mean(axis=(1, 3))
+        return float(blocks.max())
+
+    def check(self, thumbnail):
+        # "reused" si nada se movio; "moved" / "stale" si hay que inferir; None sin referencia
+        if self.reference is None or self.reference.shape != thumbnail.shape:
+            return None
+
+        if self.staleness >= self.max_staleness:
+            self.stale += 1
+            return "stale"
+
+        if self._max_block_diff(thumbnail) > self.threshold:
+            self.moved += 1
+            return "moved"
+
+        self.staleness += 1
+        self.reused += 1
+        return "reused"
+
+    def update(self, thumbnail):
+        # Nueva referencia: el frame que acaba de pasar por YOLO
+        self.reference = thumbnail
+        self.staleness = 0
+
+    def reset_stats(self):
+        # Solo contadores: la referencia sigue valiendo
+        self.reused = 0
+        self.moved = 0
+        self.stale = 0
+
+    def stats(self):
+        checks = self.reused + self.moved + self.stale
+        return {
+            "reused": self.reused,
+            "moved": self.moved,
+            "stale": self.stale,
+            "reuse_rate": self.reused / checks if checks else 0.0,
+        }
@@ -0,0 +1,79 @@
+import cv2
+import numpy as np
+
+BOX_COLOR = (0, 255, 0)
+KEYPOINT_COLOR = (0, 0, 255)
+KEYPOINT_RADIUS = 4
+KEYPOINT_CONF = 0.5
+CONF_BUCKET = 0.05 # Las etiquetas se cachean por clase y confianza redondeada a este paso
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.5
+
+def disk_offsets(radius):
+    # (dy, dx) de los pixeles que pinta cv2.circle relleno: mismo dibujo, todos los keypoints de una
+    canvas = np.zeros((2 * radius + 1, 2 * radius + 1), dtype=np.uint8)
+    cv2.circle(canvas, (radius, radius), radius, 1, -1)
+    return np.argwhere(canvas > 0) - radius
+
+class OverlayRenderer:
+    """Dibuja cajas y keypoints de un Detections (arrays NumPy).
+
+    Los keypoints se filtran con una mascara y se pintan todos juntos con un disco
+    precalculado; las etiquetas se rasterizan una vez por (clase, confianza) y se
+    reusan como mascaras.
+    """
+
+    def __init__(self, keypoint_radius=KEYPOINT_RADIUS, conf_bucket=CONF_BUCKET):
+        self.disk = disk_offsets(keypoint_radius)
+        self.conf_bucket = conf_bucket
+        self.labels = {}
+
+    def _label(self, text):
+        # Mascara booleana del texto, rasterizada una sola vez
+        if text not in self.labels:
+            (w, h), baseline = cv2.getTextSize(text, FONT, FONT_SCALE, 1)
+            canvas = np.zeros((h + baseline, w), dtype=np.uint8)
+            cv2.putText(canvas, text, (0, h), FONT, FONT_SCALE, 255, 1)
+            self.labels[text] = (canvas > 0, h)
+        return self.labels[text]
+
+    def _blit(self, frame, mask, x, y, color):
+        h, w = mask.shape
+        frame_h, frame_w = frame.shape[:2]
+        x1, y1 = max(x, 0), max(y, 0)
+        x2, y2 = min(x + w, frame_w), min(y + h, frame_h)
+        if x1 >= x2 or y1 >= y2:
+            return
+
+        region = frame[y1:y2, x1:x2]
+        region[mask[y1 - y:y2 - y, x1 - x:x2 - x]] = color
+
+    def draw_boxes(self, frame, results, class_names, color=BOX_COLOR):
+        if len(results) == 0:
+            return
+
+        xyxy = results.boxes.astype(int)
+        # Confianza redondeada al bucket: pocas etiquetas distintas en el cache
+        buckets = np.round(results.confidences / self.conf_bucket) * self.conf_bucket
+
+        for (x1, y1, x2, y2), class_id, confidence in zip(xyxy.tolist(), results.classes.tolist(), buckets.tolist()):
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            mask, text_h = self._label(f"{class_names[class_id]}: {confidence:.2f}")
+            self._blit(frame, mask, x1, y1 - 10 - text_h, color)
+
+    def draw_keypoints(self, frame, results, threshold=KEYPOINT_CONF, color=KEYPOINT_COLOR):
+        keypoints = results.keypoints
+        if keypoints is None or len(keypoints) == 0:
+            return
+
+        points = keypoints[..., :2][keypoints[..., 2] > threshold]
+        if len(points) == 0:
+            return
+
+        # (P, 2) centros x (D, 2) offsets del disco -> todos los pixeles a pintar de una vez
+        h, w = frame.shape[:2]
+        centers = points[:, ::-1].astype(int)
+        pixels = (centers[:, None, :] + self.disk[None, :, :]).reshape(-1, 2)
+        inside = (pixels[:, 0] >= 0) & (pixels[:, 0] < h) & (pixels[:, 1] >= 0) & (pixels[:, 1] < w)
+        pixels = pixels[inside]
+        frame[pixels[:, 0], pixels[:, 1]] = color
@@ -0,0 +1,134 @@
+import time
+
+SMOOTHING = 0.1
+CAPTURE_SLOTS = 64 # Timestamps de captura recientes, indexados por frame_id
+COUNTERS = (
+    "inferences", "roi_inferences", "follows", "unstable", "backoff_sleeps",
+    "motion_reused", "motion_moved", "motion_stale", "torn_frames",
+)
+STAGES = ("queue", "process", "publish", "total")
+
+class DetectorStats:
+    """Timestamps del ultimo frame y contadores de un detector.
+
+    Etapas: queue (captura -> pickup), process (pickup -> fin de inferencia o
+    seguimiento), publish (fin -> resultado publicado) y total (captura -> publicado).
+    """
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.latency = dict.fromkeys(STAGES) # Promedio movil en segundos
+
+        self.frame_id = None
+        self.captured_at = None
+        self.picked_at = None
+        self.processed_at = None
+        self.published_at = None
+
+    def _smooth(self, stage, value):
+        previous = self.latency[stage]
+        if previous is None:
+            self.latency[stage] = value
+        else:
+            self.latency[stage] = previous + self.pipeline.smoothing * (value - previous)
+
+    def picked_up(self, frame_id):
+        self.picked_at = time.monotonic()
+        self.frame_id = frame_id
+        self.captured_at = self.pipeline.capture_time(frame_id)
+        self.processed_at = None
+
+    def processed(self):
+        self.processed_at = time.monotonic()
+
+    def published(self):
+        if self.picked_at is None or self.processed_at is None:
+            return
+
+        self.published_at = time.monotonic()
+        self._smooth("process", self.processed_at - self.picked_at)
+        self._smooth("publish", self.published_at - self.processed_at)
+        if self.captured_at is not None:
+            self._smooth("queue", self.picked_at - self.captured_at)
+            self._smooth("total", self.published_at - self.captured_at)
+
+    def count(self, counter, n=1):
+        self.counters[counter] += n
+
+    def snapshot(self):
+        return {
+            "frame_id": self.frame_id,
+            **self.counters,
+            **{f"{stage}_ms": None if value is None else value * 1000 for stage, value in self.latency.items()},
+        }
+
+class PipelineStats:
+    enabled = True
+
+    def __init__(self, smoothing=SMOOTHING, slots=CAPTURE_SLOTS):
+        self.smoothing = smoothing
+        self.capture_times = [0.0] * slots
+        self.capture_ids = [-1] * slots
+        self.captures = 0
+        self.detectors = {}
+
+    def detector(self, name):
+        if name not in self.detectors:
+            self.detectors[name] = DetectorStats(self)
+        return self.detectors[name]
+
+    def captured(self, frame_id):
+        slot = frame_id % len(self.capture_ids)
+        self.capture_times[slot] = time.monotonic()
+        self.capture_ids[slot] = frame_id
+        self.captures += 1
+
+    def capture_time(self, frame_id):
+        # None si el frame ya salio de la ventana (o se capturo sin stats)
+        slot = frame_id % len(self.capture_ids)
+        if self.capture_ids[slot] != frame_id:
+            return None
+        return self.capture_times[slot]
+
+    def snapshot(self):
+        return {
+            "captures": self.captures,
+            "detectors": {name: stats.snapshot() for name, stats in self.detectors.items()},
+        }
+
+class NullDetectorStats:
+    def picked_up(self, frame_id):
+        pass
+
+    def processed(self):
+        pass
+
+    def published(self):
+        pass
+
+    def count(self, counter, n=1):
+        pass
+
+    def snapshot(self):
+        return {}
+
+class NullStats:
+    """Stats deshabilitadas: mismos metodos, sin trabajo ni timestamps."""
+
+    enabled = False
+
+    def detector(self, name):
+        return NULL_DETECTOR_STATS
+
+    def captured(self, frame_id):
+        pass
+
+    def capture_time(self, frame_id):
+        return None
+
+    def snapshot(self):
+        return {}
+
+NULL_DETECTOR_STATS = NullDetectorStats()
+NULL_STATS = NullStats()
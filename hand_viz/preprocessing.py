@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+import torch
+from functools import cached_property
+
+from motion_gate import motion_thumbnail
+
+IMGSZ = 320
+PAD_VALUE = 114
+
+def letterbox(frame, imgsz=IMGSZ):
+    h, w = frame.shape[:2]
+    gain = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    left = (imgsz - new_w) // 2
+    top = (imgsz - new_h) // 2
+
+    # Cuadrado fijo de imgsz x imgsz, igual que el LetterBox de ultralytics
+    canvas = np.full((imgsz, imgsz, 3), PAD_VALUE, dtype=np.uint8)
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas[top:top + new_h, left:left + new_w] = frame
+
+    # BGR -> RGB, HWC -> CHW, 0-255 -> 0-1
+    chw = np.ascontiguousarray(canvas[..., ::-1].transpose(2, 0, 1))
+    tensor = torch.from_numpy(chw).unsqueeze(0).float().div_(255.0)
+
+    return tensor, ((gain, gain), (left, top))
+
+class PreparedFrame:
+    """Frame de camara con su letterbox calculado una sola vez y compartido entre modelos."""
+
+    def __init__(self, frame, frame_id, imgsz=IMGSZ, timestamp=None, roi=None):
+        self.frame = frame
+        self.frame_id = frame_id
+        self.imgsz = imgsz
+        # time.monotonic() de la captura, para medir cuanto espera el frame antes del forward
+        self.timestamp = timestamp
+        # (x1, y1, x2, y2) del recorte dentro del frame completo, None si es el frame entero
+        self.roi = roi
+
+    def crop(self, roi):
+        # Recorte (vista, sin copia) con su propio letterbox: el modelo lo ve a resolucion completa
+        x1, y1, x2, y2 = roi
+        return PreparedFrame(self.frame[y1:y2, x1:x2], self.frame_id, self.imgsz, self.timestamp, roi)
+
+    @cached_property
+    def _letterbox(self):
+        return letterbox(self.frame, self.imgsz)
+
+    @cached_property
+    def thumbnail(self):
+        # Miniatura en gris para el motion gate, compartida entre modelos
+        return motion_thumbnail(self.frame)
+
+    @property
+    def tensor(self):
+        return self._letterbox[0]
+
+    @property
+    def ratio_pad(self):
+        return self._letterbox[1]
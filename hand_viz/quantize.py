@@ -0,0 +1,245 @@
+import argparse
+import glob
+import json
+import os
+import random
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import onnx
+import torch
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+from onnxruntime.quantization.shape_inference import quant_pre_process
+from ultralytics import YOLO
+from ultralytics.utils.metrics import ap_per_class, box_iou
+
+from model_backend import export_model, exported_path
+from preprocessing import IMGSZ, letterbox
+
+MODELS_DIR = os.path.join("./models")
+DATA_DIR = os.path.join("..", "capture_hands_2", "data")
+MODELS = ["controller_model.pt", "hand_model.pt"]
+
+CALIBRATION_IMAGES = 200
+EVAL_IMAGES = 200
+WARMUP_FRAMES = 5
+REFERENCE_CONF = 0.5 # Las predicciones FP32 por encima de este umbral son la referencia
+EVAL_CONF = 0.001
+KEYPOINT_CONF = 0.5
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+class LetterboxCalibrationReader(CalibrationDataReader):
+    """Alimenta la calibracion con las capturas de capture_hands_2, preprocesadas igual que en el visualizador."""
+
+    def __init__(self, image_paths, input_name, imgsz=IMGSZ):
+        self.image_paths = iter(image_paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+
+    def get_next(self):
+        for path in self.image_paths:
+            frame = cv2.imread(path)
+            if frame is None:
+                continue
+            tensor, _ = letterbox(frame, self.imgsz)
+            return {self.input_name: tensor.numpy()}
+        return None
+
+def find_images(data_dir):
+    # data/<button_name>/*.jpg, tal cual los escribe CameraSystem
+    return sorted(glob.glob(os.path.join(data_dir, "*", "*.jpg")))
+
+def quantize_model(model_path, calibration_paths, imgsz=IMGSZ):
+    model = YOLO(model_path)
+    fp32_path = export_model(model, model_path, "onnx", imgsz)
+    int8_path = exported_path(model_path, "onnx_int8")
+
+    fp32 = onnx.load(fp32_path)
+    input_name = fp32.graph.input[0].name
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prepared_path = os.path.join(tmp, "prepared.onnx")
+        quant_pre_process(fp32_path, prepared_path)
+
+        print(f"Calibrando {model_path} con {len(calibration_paths)} imagenes...")
+        quantize_static(
+            prepared_path,
+            int8_path,
+            LetterboxCalibrationReader(calibration_paths, input_name, imgsz),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+
+    # Copiamos la metadata de ultralytics (task, names, imgsz) para que YOLO() cargue bien el INT8
+    int8 = onnx.load(int8_path)
+    del int8.metadata_props[:]
+    int8.metadata_props.extend(fp32.metadata_props)
+    onnx.save(int8, int8_path)
+
+    return model.task, fp32_path, int8_path
+
+def _match_predictions(pred_boxes, pred_cls, ref_boxes, ref_cls):
+    # Matriz (P, 10) de aciertos por umbral de IoU, mismo criterio que el validador de ultralytics
+    correct = np.zeros((len(pred_boxes), len(IOU_THRESHOLDS)), dtype=bool)
+    if len(pred_boxes) == 0 or len(ref_boxes) == 0:
+        return correct, np.zeros((0, 2), dtype=int)
+
+    iou = box_iou(torch.from_numpy(ref_boxes), torch.from_numpy(pred_boxes)).numpy()
+    iou = iou * (ref_cls[:, None] == pred_cls[None, :])
+
+    pairs_at_05 = np.zeros((0, 2), dtype=int)
+    for i, threshold in enumerate(IOU_THRESHOLDS):
+        matches = np.argwhere(iou >= threshold)
+        if len(matches) == 0:
+            continue
+
+        matches = matches[iou[matches[:, 0], matches[:, 1]].argsort()[::-1]]
+        matches = matches[np.unique(matches[:, 1], return_index=True)[1]]
+        matches = matches[np.unique(matches[:, 0], return_index=True)[1]]
+        correct[matches[:, 1], i] = True
+        if i == 0:
+            pairs_at_05 = matches
+
+    return correct, pairs_at_05
+
+def _timed_predict(model, tensor, conf):
+    start = time.perf_counter()
+    result = model.predict(tensor, imgsz=IMGSZ, conf=conf, verbose=False)[0]
+    return result, time.perf_counter() - start
+
+def _latency_summary(latencies):
+    latencies = np.array(latencies) * 1000
+    return {
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+def evaluate(task, fp32_path, int8_path, eval_paths):
+    fp32 = YOLO(fp32_path, task=task)
+    int8 = YOLO(int8_path, task=task)
+
+    fp32_latency, int8_latency = [], []
+    stats = {"correct": [], "conf": [], "pred_cls": [], "target_cls": []}
+    keypoint_errors = []
+    evaluated = 0
+
+    for n, path in enumerate(eval_paths):
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        evaluated += 1
+        tensor, ((gain, _), _) = letterbox(frame, IMGSZ)
+
+        reference, fp32_time = _timed_predict(fp32, tensor, REFERENCE_CONF)
+        prediction, int8_time = _timed_predict(int8, tensor, EVAL_CONF)
+        if n >= WARMUP_FRAMES or len(eval_paths) <= WARMUP_FRAMES:
+            fp32_latency.append(fp32_time)
+            int8_latency.append(int8_time)
+
+        ref_boxes = reference.boxes.xyxy.cpu().numpy()
+        ref_cls = reference.boxes.cls.cpu().numpy()
+        pred_boxes = prediction.boxes.xyxy.cpu().numpy()
+        pred_cls = prediction.boxes.cls.cpu().numpy()
+
+        correct, pairs = _match_predictions(pred_boxes, pred_cls, ref_boxes, ref_cls)
+        stats["correct"].append(correct)
+        stats["conf"].append(prediction.boxes.conf.cpu().numpy())
+        stats["pred_cls"].append(pred_cls)
+        stats["target_cls"].append(ref_cls)
+
+        if task == "pose" and len(pairs):
+            ref_kpts = reference.keypoints.data.cpu().numpy()[pairs[:, 0]]
+            pred_kpts = prediction.keypoints.data.cpu().numpy()[pairs[:, 1]]
+            visible = ref_kpts[..., 2] > KEYPOINT_CONF
+            # Error en pixeles del frame original, no del letterbox
+            distances = np.linalg.norm(pred_kpts[..., :2] - ref_kpts[..., :2], axis=-1) / gain
+            keypoint_errors.append(distances[visible])
+
+    if not evaluated:
+        raise SystemExit(f"No se pudo leer ninguna de las {len(eval_paths)} imagenes de evaluacion de {int8_path}")
+
+    stats = {k: np.concatenate(v, 0) for k, v in stats.items()}
+    report = {
+        "images": evaluated,
+        "reference_detections": int(len(stats["target_cls"])),
+        "fp32": _latency_summary(fp32_latency),
+        "int8": _latency_summary(int8_latency),
+    }
+    report["speedup"] = report["fp32"]["mean_ms"] / report["int8"]["mean_ms"]
+
+    if len(stats["target_cls"]):
+        ap = ap_per_class(stats["correct"], stats["conf"], stats["pred_cls"], stats["target_cls"])[5]
+        report["map50_vs_fp32"] = float(ap[:, 0].mean())
+        report["map50_95_vs_fp32"] = float(ap.mean())
+
+    if keypoint_errors:
+        errors = np.concatenate(keypoint_errors)
+        report["keypoint_error_px"] = {
+            "mean": float(errors.mean()) if len(errors) else None,
+            "p95": float(np.percentile(errors, 95)) if len(errors) else None,
+        }
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Cuantiza a INT8 los modelos de hand_viz y compara contra FP32")
+    parser.add_argument("--models", nargs="+", default=[os.path.join(MODELS_DIR, m) for m in MODELS])
+    parser.add_argument("--data", default=DATA_DIR, help="Carpeta data/ de capture_hands_2")
+    parser.add_argument("--calibration-images", type=int, default=CALIBRATION_IMAGES)
+    parser.add_argument("--eval-images", type=int, default=EVAL_IMAGES)
+    parser.add_argument("--report", default=os.path.join(MODELS_DIR, "int8_report.json"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--allow-eval-on-calibration", action="store_true",
+                        help="Sin imagenes para evaluar aparte, medir sobre las de calibracion (precision optimista)")
+    args = parser.parse_args()
+
+    images = find_images(args.data)
+    if not images:
+        raise SystemExit(f"No hay imagenes .jpg en {args.data}/<button_name>/")
+
+    # Calibracion y evaluacion con imagenes distintas
+    random.Random(args.seed).shuffle(images)
+    calibration_paths = images[:args.calibration_images]
+    eval_paths = images[args.calibration_images:args.calibration_images + args.eval_images]
+    eval_on_calibration = not eval_paths
+    if eval_on_calibration:
+        if not args.allow_eval_on_calibration:
+            raise SystemExit(
+                f"Solo hay {len(images)} imagenes: no queda ninguna para evaluar despues de las {args.calibration_images} de calibracion. "
+                "Baja --calibration-images o usa --allow-eval-on-calibration"
+            )
+        print("ADVERTENCIA: se evalua sobre las imagenes de calibracion; la precision INT8 reportada es optimista")
+        eval_paths = calibration_paths
+
+    report = {}
+    for model_path in args.models:
+        task, fp32_path, int8_path = quantize_model(model_path, calibration_paths)
+        report[os.path.basename(model_path)] = {
+            "task": task,
+            "int8_path": int8_path,
+            "eval_images": len(eval_paths),
+            "eval_on_calibration": eval_on_calibration,
+            **evaluate(task, fp32_path, int8_path, eval_paths),
+        }
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, entry in report.items():
+        line = f"{name}: FP32 {entry['fp32']['mean_ms']:.1f} ms -> INT8 {entry['int8']['mean_ms']:.1f} ms (x{entry['speedup']:.2f})"
+        if "map50_vs_fp32" in entry:
+            line += f", mAP50 vs FP32 {entry['map50_vs_fp32']:.3f}"
+        if entry.get("keypoint_error_px", {}).get("mean") is not None:
+            line += f", error keypoints {entry['keypoint_error_px']['mean']:.2f} px"
+        if entry["eval_on_calibration"]:
+            line += " [evaluado sobre calibracion]"
+        print(line)
+    print(f"Reporte guardado en {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import asyncio
+import json
+from collections import deque
+
+from result_stream import BATCH, BATCH_HEADER, FRAME, HELLO, REQUEST, RESULT, SOCKET_PATH, decode_result
+
+class ResultClient:
+    """Cliente asyncio del socket de resultados de visualization.py --headless.
+
+        client = await ResultClient.connect()
+        async for stream, model, detections in client:
+            ...
+
+    Cuando se terminan los resultados recibidos se pide el siguiente batch: el mas
+    nuevo de cada canal publicado desde el pedido anterior. Lo que el cliente no llega
+    a leer se descarta en el servidor.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.channels = []
+        self.pending = deque()
+
+    @classmethod
+    async def connect(cls, path=SOCKET_PATH):
+        reader, writer = await asyncio.open_unix_connection(path)
+        client = cls(reader, writer)
+
+        kind, body = await client._read_message()
+        if kind != HELLO:
+            raise ConnectionError(f"Se esperaba el saludo del servidor, llego el tipo {kind}")
+        client.channels = json.loads(body)["channels"]
+        for channel in client.channels:
+            channel["names"] = {int(k): v for k, v in channel["names"].items()}
+        return client
+
+    async def _read_message(self):
+        length, kind = FRAME.unpack(await self.reader.readexactly(FRAME.size))
+        return kind, await self.reader.readexactly(length)
+
+    async def _read_batch(self):
+        self.writer.write(REQUEST)
+        await self.writer.drain()
+
+        kind, body = await self._read_message()
+        if kind != BATCH:
+            raise ConnectionError(f"Se esperaba un batch, llego el tipo {kind}")
+
+        for _ in range(BATCH_HEADER.unpack(body)[0]):
+            kind, body = await self._read_message()
+            if kind == RESULT:
+                channel, detections, _ = decode_result(body)
+                channel = self.channels[channel]
+                self.pending.append((channel["stream"], channel["model"], detections))
+
+    async def recv(self):
+        # -> (stream, modelo, Detections); IncompleteReadError si el servidor cerro
+        while not self.pending:
+            await self._read_batch()
+        return self.pending.popleft()
+
+    def names(self, stream, model):
+        for channel in self.channels:
+            if channel["stream"] == stream and channel["model"] == model:
+                return channel["names"]
+        return {}
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.recv()
+        except asyncio.IncompleteReadError:
+            raise StopAsyncIteration
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
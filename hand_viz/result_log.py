@@ -0,0 +1,212 @@
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from detections import Detections
+
+CHUNK_FRAMES = 300 # Resultados por chunk (~10 s por modelo a 30 FPS)
+FLUSH_INTERVAL = 5.0 # Segundos maximos antes de escribir un chunk incompleto
+MAX_QUEUE = 1024
+META_FILE = "meta.json"
+CHUNK_PATTERN = "chunk_*.npz"
+
+class ResultLogWriter:
+    """Log binario append-only de Detections: un .npz columnar por chunk, escrito en su propio hilo.
+
+    Cada canal (stream.modelo) guarda por resultado frame_id, timestamp de captura,
+    momento de publicacion y cantidad de detecciones; las detecciones van concatenadas
+    (boxes, classes, confidences, track_ids, keypoints). Los hilos de deteccion solo
+    encolan: si el disco no da abasto se descartan resultados en lugar de frenar la inferencia.
+    """
+
+    def __init__(self, path, chunk_frames=CHUNK_FRAMES, flush_interval=FLUSH_INTERVAL, max_queue=MAX_QUEUE):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.flush_interval = flush_interval
+
+        os.makedirs(path, exist_ok=True)
+        self.chunk_index = len(glob.glob(os.path.join(path, CHUNK_PATTERN)))
+        self.meta = self._read_meta()
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.pending = {}
+        self.pending_count = 0
+        self.dropped = 0
+        self.written = 0
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def _read_meta(self):
+        meta_path = os.path.join(self.path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                return json.load(f)
+        return {"channels": {}}
+
+    def channel(self, stream, model, names):
+        # Devuelve el callback que recibe cada Detections publicado en ese canal
+        name = f"{stream}.{model}"
+        self.meta["channels"][name] = {"stream": stream, "model": model, "names": {str(k): v for k, v in names.items()}}
+        with open(os.path.join(self.path, META_FILE), "w") as f:
+            json.dump(self.meta, f, indent=2)
+
+        def log(detections):
+            if detections is None:
+                return
+            try:
+                self.queue.put_nowait((name, detections, time.monotonic()))
+            except queue.Full:
+                self.dropped += 1
+
+        return log
+
+    def _append(self, name, detections, published_at):
+        self.pending.setdefault(name, []).append((detections, published_at))
+        self.pending_count += 1
+
+    def _columns(self, name, records):
+        counts = np.array([len(d) for d, _ in records], dtype=np.int32)
+        columns = {
+            "frame_id": np.array([-1 if d.frame_id is None else d.frame_id for d, _ in records], dtype=np.int64),
+            "timestamp": np.array([np.nan if d.timestamp is None else d.timestamp for d, _ in records], dtype=np.float64),
+            "published_at": np.array([t for _, t in records], dtype=np.float64),
+            "count": counts,
+            "boxes": np.concatenate([d.boxes for d, _ in records]),
+            "classes": np.concatenate([d.classes for d, _ in records]),
+            "confidences": np.concatenate([d.confidences for d, _ in records]),
+            "track_ids": np.concatenate([d.track_ids for d, _ in records]),
+        }
+
+        keypoints = [d.keypoints for d, _ in records if d.keypoints is not None]
+        if keypoints:
+            shape = keypoints[0].shape[1:]
+            # Resultados de seguimiento (Kalman) sin keypoints: se rellenan con confianza 0
+            columns["keypoints"] = np.concatenate([
+                d.keypoints if d.keypoints is not None else np.zeros((len(d),) + shape, dtype=np.float32)
+                for d, _ in records
+            ])
+
+        return {f"{name}.{key}": value for key, value in columns.items()}
+
+    def flush(self):
+        if not self.pending_count:
+            return
+
+        arrays = {}
+        for name, records in self.pending.items():
+            arrays.update(self._columns(name, records))
+
+        # Escribimos a un temporal y renombramos: un lector nunca ve un chunk a medias
+        chunk_path = os.path.join(self.path, f"chunk_{self.chunk_index:06d}.npz")
+        tmp_path = chunk_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, chunk_path)
+
+        self.chunk_index += 1
+        self.written += self.pending_count
+        self.pending = {}
+        self.pending_count = 0
+
+    def run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = ()
+
+            if item is None:
+                break
+            if item:
+                self._append(*item)
+
+            now = time.monotonic()
+            if self.pending_count >= self.chunk_frames or now - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = now
+
+        self.flush()
+
+    def close(self):
+        # Vacia la cola y escribe el ultimo chunk
+        if not self.thread.is_alive():
+            return
+        self.queue.put(None)
+        self.thread.join()
+
+    def stats(self):
+        return {"written": self.written, "dropped": self.dropped, "queued": self.queue.qsize(), "chunks": self.chunk_index}
+
+class ChannelLog:
+    """Todos los resultados de un canal, concatenados y listos para analisis."""
+
+    def __init__(self, name, meta, chunks):
+        self.name = name
+        self.stream = meta["stream"]
+        self.model = meta["model"]
+        self.names = {int(k): v for k, v in meta["names"].items()}
+
+        def column(key):
+            return [chunk[f"{name}.{key}"] for chunk in chunks if f"{name}.{key}" in chunk]
+
+        self.frame_id = np.concatenate(column("frame_id") or [np.zeros(0, dtype=np.int64)])
+        self.timestamp = np.concatenate(column("timestamp") or [np.zeros(0)])
+        self.published_at = np.concatenate(column("published_at") or [np.zeros(0)])
+        self.count = np.concatenate(column("count") or [np.zeros(0, dtype=np.int32)])
+        self.boxes = np.concatenate(column("boxes") or [np.zeros((0, 4), dtype=np.float32)])
+        self.classes = np.concatenate(column("classes") or [np.zeros(0, dtype=np.int32)])
+        self.confidences = np.concatenate(column("confidences") or [np.zeros(0, dtype=np.float32)])
+        self.track_ids = np.concatenate(column("track_ids") or [np.zeros(0, dtype=np.int32)])
+
+        # Chunks sin keypoints (solo seguimiento) se completan para que las filas coincidan con boxes
+        keypoints = []
+        shape = next((chunk[f"{name}.keypoints"].shape[1:] for chunk in chunks if f"{name}.keypoints" in chunk), None)
+        if shape is not None:
+            for chunk in chunks:
+                if f"{name}.keypoints" in chunk:
+                    keypoints.append(chunk[f"{name}.keypoints"])
+                elif f"{name}.boxes" in chunk:
+                    keypoints.append(np.zeros((len(chunk[f"{name}.boxes"]),) + shape, dtype=np.float32))
+        self.keypoints = np.concatenate(keypoints) if keypoints else None
+
+        # offsets[i]:offsets[i + 1] son las detecciones del resultado i
+        self.offsets = np.concatenate(([0], np.cumsum(self.count)))
+
+    def __len__(self):
+        return len(self.frame_id)
+
+    @property
+    def latency(self):
+        # Captura -> publicacion, en segundos
+        return self.published_at - self.timestamp
+
+    def detections(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return Detections(
+            self.boxes[start:end],
+            self.classes[start:end],
+            self.confidences[start:end],
+            self.track_ids[start:end],
+            None if self.keypoints is None else self.keypoints[start:end],
+            frame_id=int(self.frame_id[i]),
+            timestamp=float(self.timestamp[i])
+        )
+
+def load_log(path):
+    # Carga masiva para scripts de analisis: {"stream0.hands": ChannelLog, ...}
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+
+    chunks = []
+    for chunk_path in sorted(glob.glob(os.path.join(path, CHUNK_PATTERN))):
+        with np.load(chunk_path) as chunk:
+            chunks.append(dict(chunk))
+
+    return {name: ChannelLog(name, channel_meta, chunks) for name, channel_meta in meta["channels"].items()}
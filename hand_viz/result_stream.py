@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from detections import Detections
+
+SOCKET_PATH = "/tmp/hand_viz.sock"
+
+# Cada mensaje: largo del cuerpo (uint32) y tipo (uint8), despues el cuerpo
+FRAME = struct.Struct("<IB")
+HELLO = 0 # JSON con los canales (stream, modelo, nombres de clase), al conectarse
+RESULT = 1 # Un Detections
+BATCH = 2 # Cantidad (uint16) de RESULT que siguen, en respuesta a un pedido
+BATCH_HEADER = struct.Struct("<H")
+REQUEST = b"\x01" # El cliente pide el siguiente batch
+# canal, frame_id, timestamp de captura, publicado, detecciones, keypoints por deteccion
+RESULT_HEADER = struct.Struct("<HqddII")
+
+def encode_result(channel, detections, published_at):
+    n = len(detections)
+    k = 0 if detections.keypoints is None else detections.keypoints.shape[1]
+    frame_id = -1 if detections.frame_id is None else detections.frame_id
+    timestamp = np.nan if detections.timestamp is None else detections.timestamp
+
+    parts = [
+        RESULT_HEADER.pack(channel, frame_id, timestamp, published_at, n, k),
+        detections.boxes.tobytes(),
+        detections.classes.tobytes(),
+        detections.confidences.tobytes(),
+        detections.track_ids.tobytes(),
+    ]
+    if k:
+        parts.append(detections.keypoints.tobytes())
+
+    body = b"".join(parts)
+    return FRAME.pack(len(body), RESULT) + body
+
+def decode_result(body):
+    # -> (canal, Detections, publicado); los arrays son vistas sobre body
+    channel, frame_id, timestamp, published_at, n, k = RESULT_HEADER.unpack_from(body)
+    offset = RESULT_HEADER.size
+
+    def take(dtype, count):
+        nonlocal offset
+        array = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+        offset += array.nbytes
+        return array
+
+    boxes = take(np.float32, n * 4).reshape(n, 4)
+    classes = take(np.int32, n)
+    confidences = take(np.float32, n)
+    track_ids = take(np.int32, n)
+    keypoints = take(np.float32, n * k * 3).reshape(n, k, 3) if k else None
+
+    detections = Detections(boxes, classes, confidences, track_ids, keypoints,
+                            frame_id=None if frame_id < 0 else frame_id, timestamp=timestamp)
+    return channel, detections, published_at
+
+def encode_batch(messages):
+    return FRAME.pack(BATCH_HEADER.size, BATCH) + BATCH_HEADER.pack(len(messages)) + b"".join(messages)
+
+def encode_hello(channels):
+    body = json.dumps({"channels": channels}).encode()
+    return FRAME.pack(len(body), HELLO) + body
+
+class _Client:
+    def __init__(self, writer):
+        self.writer = writer
+        self.latest = {} # canal -> ultimo mensaje sin enviar
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+class ResultServer:
+    """Publica cada Detections por un socket Unix, con un event loop asyncio en su propio hilo.
+
+    Los detectores solo agendan el resultado en el loop. Cada cliente tiene un solo
+    mensaje pendiente por canal y los recibe cuando los pide (REQUEST): lo que se
+    publica mientras el cliente esta ocupado reemplaza al pendiente (latest-only) en
+    lugar de encolarse en el socket.
+    """
+
+    def __init__(self, path=SOCKET_PATH):
+        self.path = path
+        self.channels = []
+        self.clients = set()
+        self.dropped = 0
+        self.sent = 0
+
+        self.loop = asyncio.new_event_loop()
+        self.started = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.started.wait()
+
+    def channel(self, stream, model, names):
+        # Mismo contrato que ResultLogWriter.channel: callback por resultado publicado
+        channel = len(self.channels)
+        self.channels.append({"stream": stream, "model": model, "names": {str(k): v for k, v in names.items()}})
+
+        def publish(detections):
+            # Sin clientes no cruzamos al loop
+            if detections is None or not self.clients:
+                return
+            try:
+                self.loop.call_soon_threadsafe(self._offer, channel, detections, time.monotonic())
+            except RuntimeError:
+                # El loop ya cerro (close() durante el apagado)
+                pass
+
+        return publish
+
+    def _offer(self, channel, detections, published_at):
+        # Se codifica una vez en el hilo del loop y se comparte entre clientes
+        message = encode_result(channel, detections, published_at)
+        for client in self.clients:
+            if channel in client.latest:
+                client.dropped += 1
+                self.dropped += 1
+            client.latest[channel] = message
+            client.ready.set()
+
+    async def _serve(self, reader, writer):
+        client = _Client(writer)
+        self.clients.add(client)
+        try:
+            writer.write(encode_hello(self.channels))
+            await writer.drain()
+
+            while True:
+                # Un batch por pedido: nunca hay mas de uno en vuelo
+                if not await reader.read(len(REQUEST)):
+                    break
+                await client.ready.wait()
+                client.ready.clear()
+                messages = list(client.latest.values())
+                client.latest.clear()
+
+                writer.write(encode_batch(messages))
+                await writer.drain()
+                client.sent += len(messages)
+                self.sent += len(messages)
+        except (ConnectionError, BrokenPipeError):
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        # Un socket que quedo de una corrida anterior
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        server = self.loop.run_until_complete(asyncio.start_unix_server(self._serve, path=self.path))
+        self.started.set()
+        self.loop.run_forever()
+
+        server.close()
+        self.clients = set()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.run_until_complete(server.wait_closed())
+        self.loop.close()
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def close(self):
+        if not self.thread.is_alive():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=1.0)
+
+    def stats(self):
+        return {"clients": len(self.clients), "sent": self.sent, "dropped": self.dropped}
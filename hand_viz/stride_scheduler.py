@@ -0,0 +1,119 @@
+import math
+
+MAX_STRIDE = 10
+DRIFT_BUDGET = 20 # Pixeles que dejamos derivar al Kalman entre inferencias completas
+SMOOTHING = 0.2
+
+class StrideScheduler:
+    """Decide en cada frame si correr YOLO completo o seguir solo con el Kalman.
+
+    El stride sale de dos cotas: la de carga (cuantos frames hay que repartir una
+    inferencia para que el costo medio entre en frame_time) y la de movimiento
+    (cuantos frames puede el Kalman seguir los tracks sin pasar DRIFT_BUDGET). El
+    movimiento se mide entre inferencias reales; sin medicion todavia el stride es 1.
+    """
+
+    def __init__(self, frame_time, max_stride=MAX_STRIDE, drift_budget=DRIFT_BUDGET, smoothing=SMOOTHING):
+        self.frame_time = frame_time
+        self.max_stride = max_stride
+        self.drift_budget = drift_budget
+        self.smoothing = smoothing
+
+        self.inference_latency = None
+        self.follow_latency = None
+        self.motion = None
+
+        self.stride = 1
+        self.frames_since_inference = 0
+
+        self.inferences = 0
+        self.follows = 0
+        self.stable_follows = 0
+        self.forced = {"no_tracks": 0, "stride": 0, "unstable": 0}
+
+    def _smooth(self, previous, value):
+        if previous is None:
+            return value
+        return previous + self.smoothing * (value - previous)
+
+    def _load_stride(self):
+        # Stride minimo para que (inferencia + (k-1) seguimientos) / k <= frame_time
+        if self.inference_latency is None or self.inference_latency <= self.frame_time:
+            return 1
+
+        follow = self.follow_latency or 0.0
+        if follow >= self.frame_time:
+            return self.max_stride
+
+        return math.ceil((self.inference_latency - follow) / (self.frame_time - follow))
+
+    def _motion_stride(self):
+        # Cuantos frames aguanta el Kalman con el movimiento observado; sin medicion, inferencia en cada frame
+        if self.motion is None:
+            return 1
+        if self.motion <= 0:
+            # Cajas quietas entre dos inferencias reales
+            return self.max_stride
+
+        return int(self.drift_budget / self.motion)
+
+    def _update_stride(self):
+        stride = max(self._load_stride(), self._motion_stride())
+        self.stride = max(1, min(stride, self.max_stride))
+
+    def should_follow(self, has_tracks):
+        if self.max_stride <= 1:
+            return False
+
+        if not has_tracks:
+            self.forced["no_tracks"] += 1
+            return False
+
+        # Stride k: una inferencia cada k frames, es decir k - 1 seguimientos entre inferencias
+        if self.frames_since_inference >= self.stride - 1:
+            self.forced["stride"] += 1
+            return False
+
+        return True
+
+    def record_inference(self, latency, motion):
+        # motion: desplazamiento maximo de las cajas (px/frame) desde la inferencia anterior,
+        # None si algun track no tiene medicion (recien creado): volvemos a stride 1 hasta medirlo
+        self.inferences += 1
+        self.frames_since_inference = 0
+        self.inference_latency = self._smooth(self.inference_latency, latency)
+        self.motion = None if motion is None else self._smooth(self.motion, motion)
+        self._update_stride()
+
+    def record_follow(self, latency, stable):
+        self.follows += 1
+        self.follow_latency = self._smooth(self.follow_latency, latency)
+
+        if stable:
+            self.stable_follows += 1
+            self.frames_since_inference += 1
+        else:
+            self.forced["unstable"] += 1
+
+        self._update_stride()
+
+    def reset_stats(self):
+        # Solo contadores: las latencias y el movimiento estimados siguen valiendo
+        self.inferences = 0
+        self.follows = 0
+        self.stable_follows = 0
+        self.forced = dict.fromkeys(self.forced, 0)
+
+    def stats(self):
+        decisions = self.inferences + self.follows
+        return {
+            "stride": self.stride,
+            "inferences": self.inferences,
+            "follows": self.follows,
+            "follow_rate": self.follows / decisions if decisions else 0.0,
+            "stable_follow_rate": self.stable_follows / self.follows if self.follows else 0.0,
+            "forced_inferences": dict(self.forced),
+            "inference_ms": None if self.inference_latency is None else self.inference_latency * 1000,
+            "follow_ms": None if self.follow_latency is None else self.follow_latency * 1000,
+            "motion_px": self.motion,
+        }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los modulos de hand_viz se importan planos (se corre desde hand_viz/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
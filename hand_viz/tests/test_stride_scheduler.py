@@ -0,0 +1,43 @@
+from stride_scheduler import StrideScheduler
+
+FRAME_TIME = 1 / 30
+
+def run_pattern(scheduler, frames):
+    # "I" = inferencia completa, "F" = seguimiento con Kalman (estable)
+    pattern = ""
+    for _ in range(frames):
+        if scheduler.should_follow(has_tracks=True):
+            scheduler.record_follow(0.001, stable=True)
+            pattern += "F"
+        else:
+            scheduler.record_inference(0.001, motion=None)
+            pattern += "I"
+    return pattern
+
+def fixed_stride(stride):
+    scheduler = StrideScheduler(FRAME_TIME)
+    # Stride fijo: sin actualizarlo con latencias ni movimiento
+    scheduler._update_stride = lambda: None
+    scheduler.stride = stride
+    # En vivo el primer frame siempre pasa por el modelo (todavia no hay tracks)
+    scheduler.record_inference(0.001, motion=None)
+    return scheduler
+
+def test_stride_one_never_follows():
+    assert run_pattern(fixed_stride(1), 12) == "I" * 12
+
+def test_stride_k_follows_k_minus_one_frames():
+    for stride in (2, 3, 5):
+        pattern = run_pattern(fixed_stride(stride), stride * 4)
+        assert pattern == ("F" * (stride - 1) + "I") * 4
+
+def test_no_motion_measurement_means_inference_every_frame():
+    # Tracks recien creados (motion None) y latencia dentro del presupuesto: sin seguimientos
+    assert run_pattern(StrideScheduler(FRAME_TIME), 10) == "I" * 10
+
+def test_static_measurement_follows_up_to_max_stride():
+    scheduler = StrideScheduler(FRAME_TIME, max_stride=4)
+    scheduler.record_inference(0.001, motion=0.0)
+    assert scheduler.stride == 4
+    assert run_pattern(scheduler, 3) == "FFF"
+    assert not scheduler.should_follow(has_tracks=True)
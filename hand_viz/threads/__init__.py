@@ -1,4 +1,7 @@
 from threads.threads import YOLODetectorThread
 from threads.camera_thread import CameraThread
 from threads.detection_thread import DetectionThread
-from threads.hands_thread import HandsThread
\ No newline at end of file
+from threads.inference_thread import InferenceThread
+from threads.process_detection_thread import ProcessDetectionThread
+from threads.hands_thread import HandsThread
+from threads.replay_thread import ReplayThread
\ No newline at end of file
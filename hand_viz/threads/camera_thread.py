@@ -1,28 +1,43 @@
 import cv2
+import os
 import time
 
 from threads import YOLODetectorThread
 
 class CameraThread(YOLODetectorThread):
+    def __init__(self, YOLODetector, source=0):
+        super().__init__(YOLODetector)
+
+        # Indice de dispositivo, archivo de video o URL (rtsp://, http://) que entienda cv2
+        self.source = int(source) if isinstance(source, str) and source.isdigit() else source
+        self.is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+
     def run(self):
-        cap = cv2.VideoCapture(0)
+        cap = cv2.VideoCapture(self.source)
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         cap.set(cv2.CAP_PROP_FPS, 30)
-        
-        last_capture_time = time.time()
-
-        while self.context.running:
-            current_time = time.time()
-
-            #Limitamos FPS en la camara
-            if current_time - last_capture_time >= self.context.frame_time:
-                ret, frame = cap.read()
-                if ret:
-                    #PERMITIMOS QUE SOLO UN HILO TRABAJE CON EL FRAME ACTUAL
-                    self.context.mutex["current_frame"].update(frame.copy())#Copiamos el frame para que solo se trabaje con este
-
-                last_capture_time = current_time
-            else:
-                time.sleep(0.001) #Permite que no consuma todo el nucleo
+
+        frame_buffer = self.context.frame_buffer
+        stop_event = self.context.stop_event
+        stats = self.context.stats
+
+        while not stop_event.is_set():
+            capture_start = time.time()
+
+            #Leemos directo sobre el proximo slot del buffer, sin copias intermedias
+            ret, frame = cap.read(frame_buffer.next_slot())
+            if ret:
+                # Timestamp antes de publicar: un detector puede tomar el frame apenas se escribe
+                stats.captured(frame_buffer.seq + 1)
+                # Avisa "frame N nuevo" a los detectores bloqueados en el buffer
+                frame_buffer.write(frame)
+            elif self.is_file:
+                # Un archivo hace de camara en vivo: al terminar vuelve a empezar
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+            #Limitamos FPS en la camara; el wait se corta apenas se pide parar
+            remaining = self.context.frame_time - (time.time() - capture_start)
+            if remaining > 0:
+                stop_event.wait(remaining)
         cap.release()
\ No newline at end of file
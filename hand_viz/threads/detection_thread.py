@@ -1,150 +1,387 @@
 import time
-from ultralytics import YOLO
-from ultralytics.engine.results import Results
+from ultralytics.engine.results import Boxes
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace, YAML, ops
+from ultralytics.utils.checks import check_yaml
 import numpy as np
-import torch
 
 from threads import YOLODetectorThread
+from preprocessing import PreparedFrame, IMGSZ
+from stride_scheduler import StrideScheduler
+from model_backend import load_model
+from pipeline_stats import NULL_STATS
+from motion_gate import MotionGate, MAX_STALENESS
+from detections import Detections
+from keypoint_filter import KeypointFilter
 
-MAX_STRIDE = 10
+MAX_STRIDE = 10 # Tope del stride adaptativo
 MOTION_THRESH = 5
 AREA_THRESH = 1.007
-COV_INCREASE = 1.07
+# Crecimiento de la traza de covarianza desde la ultima inferencia. Un paso de prediccion de
+# ByteTrack la multiplica por ~2.6, 1.8, 1.5, 1.4, 1.3... (acumulado 2.6, 4.6, 7.0, 9.9, 13.3, 17.2, 21.6):
+# con 20 se aceptan hasta 6 seguimientos seguidos, menos si la caja crece
+COV_INCREASE = 20.0
 MAX_WAIT_FPS = 30
+CONF_THRESH = 0.5
+ROI_EXPAND = 2.0 # Lado del recorte respecto de la caja del control
+ROI_MIN_SIZE = 160 # No ampliamos recortes mas chicos que esto
+ROI_MAX_FRACTION = 0.8 # Si el recorte cubre casi todo el frame, usamos el frame completo
+TRACKER_CONFIG = "bytetracker.yaml"
 
 class DetectionThread(YOLODetectorThread):
-    tracker = None
-    tracks = []
-    
-    def __init__(self, YOLODetector, model_path, thread_name, max_stride=MAX_STRIDE, motion_thresh=MOTION_THRESH, area_thresh=AREA_THRESH, cov_increase=COV_INCREASE):
+    def __init__(self, YOLODetector, model_path, thread_name, max_stride=MAX_STRIDE, motion_thresh=MOTION_THRESH, area_thresh=AREA_THRESH, cov_increase=COV_INCREASE, frame_time=None, backend="torch", model=None, roi_source=None, roi_expand=ROI_EXPAND, motion_gate=False, max_staleness=MAX_STALENESS, smooth_keypoints=False):
         super().__init__(YOLODetector)
 
         self.thread_name = thread_name
 
-        self.model = YOLO(model_path)
+        # torch (.pt), onnx u openvino; los exportados se cachean al lado del .pt.
+        # Con varias fuentes el modelo se comparte y cada stream solo aporta su tracker
+        self.model = model if model is not None else load_model(model_path, backend)
+        self.names = self.model.names
+
+        # Un tracker propio por modelo: la inferencia recibe el tensor ya preprocesado
+        tracker_args = IterableSimpleNamespace(**YAML.load(check_yaml(TRACKER_CONFIG)))
+        self.tracker = BYTETracker(args=tracker_args)
+        self.tracks = []
 
-        self.max_stride = max_stride
         self.motion_thresh = motion_thresh
         self.area_thresh = area_thresh
         self.cov_increase = cov_increase
+        self.follow_reference = None # Estado de los tracks en la ultima inferencia
         self.results = None
 
         self.max_wait_fps = MAX_WAIT_FPS
 
-    def _interpolate(self, frame, path):
-        self.tracker = self.model.predictor.trackers[0]
+        # Modo ROI: inferimos sobre un recorte alrededor de las cajas de otro detector (el del control)
+        self.roi_source = roi_source
+        self.roi_expand = roi_expand
+
+        # Escena quieta con detecciones: reusamos resultados en lugar de correr YOLO
+        self.motion_gate = MotionGate(max_staleness) if motion_gate else None
+
+        # One-Euro por track sobre los keypoints; tambien los predice en los frames de Kalman
+        self.keypoint_filter = KeypointFilter() if smooth_keypoints else None
+
+        # Decide frame a frame entre YOLO completo y seguimiento con Kalman
+        if frame_time is None:
+            frame_time = self.context.frame_time
+        self.scheduler = StrideScheduler(frame_time, max_stride=max_stride)
+
+        self.is_trackable = False
+        self.is_following_stable = False
+        self.has_detections = False
+        self.empty_frames = 0
+
+        # Movimiento para el scheduler: centros de los tracks en la ultima inferencia y en que paso fue
+        self.steps = 0
+        self.last_inference = None
+        self.inference_boxes = None # Cajas crudas del modelo (sin Kalman), en el orden de results
+
+        # Timestamps y contadores; sin stats en el contexto (worker, benchmark) quedan en no-op
+        self.recorder = getattr(YOLODetector, "stats", NULL_STATS).detector(thread_name)
+
+    def _track_state(self, tracks):
+        # Estado del Kalman de todos los tracks a la vez: ids (N,), cajas xyxy (N,4), trazas de covarianza (N,)
+        if len(tracks) == 0:
+            return np.zeros(0, dtype=int), np.zeros((0, 4)), np.zeros(0)
+
+        ids = np.array([t.track_id for t in tracks])
+        means = np.stack([t.mean for t in tracks])
+        covariances = np.stack([t.covariance for t in tracks])
+
+        # mean = (cx, cy, aspect, h, ...) -> xyxy
+        centers = means[:, :2]
+        half_wh = np.column_stack((means[:, 2] * means[:, 3], means[:, 3])) / 2
+        boxes = np.hstack((centers - half_wh, centers + half_wh))
+
+        return ids, boxes, np.einsum("nii->n", covariances)
+
+    def _inference_motion(self):
+        # Desplazamiento maximo (px/paso) de las cajas detectadas entre las dos ultimas inferencias.
+        # No usamos la velocidad del Kalman: ByteTrack arranca cada track nuevo con velocidad 0,
+        # que se leeria como escena quieta. Un track sin inferencia anterior no da informacion: None
+        previous = self.last_inference
+        boxes = self.inference_boxes
+        self.inference_boxes = None
+        if self.results is None or boxes is None or len(boxes) == 0:
+            self.last_inference = None
+            return None
+
+        ids = self.results.track_ids
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        self.last_inference = (self.steps, ids, centers)
+
+        if previous is None or previous[0] >= self.steps:
+            return None
+
+        previous_step, previous_ids, previous_centers = previous
+        _, current, matched = np.intersect1d(ids, previous_ids, return_indices=True)
+        if len(current) < len(ids):
+            # Tracks nuevos (o que cambiaron de id por un salto grande): sin medicion
+            return None
+
+        displacement = np.linalg.norm(centers[current] - previous_centers[matched], axis=1).max()
+        return float(displacement) / (self.steps - previous_step)
+
+    def _interpolate(self, frame):
         self.tracks = [t for t in self.tracker.tracked_stracks if t.is_activated]
-        
+
         # Apply Kalman Filter to get predicted locations
         self.tracker.multi_predict(self.tracks)
         self.tracker.frame_id += 1
-        
-        boxes = np.array([np.hstack([np.array(t.xyxy).reshape(-1), t.track_id, t.score, t.cls]) for t in self.tracks])
-        
+
         # Update frame_id in tracks
         for t in self.tracks:
             t.frame_id = self.tracker.frame_id
-        
-        if len(self.tracks) == 0:
-            tensor = torch.zeros((0,6))
-        else:
-            tensor = torch.from_numpy(boxes)
 
-        self.results = Results(frame, path, self.model.names, boxes=tensor)
+        ids, boxes, traces = self._track_state(self.tracks)
+        scores = np.array([t.score for t in self.tracks], dtype=np.float32)
+        classes = np.array([t.cls for t in self.tracks], dtype=np.int32)
+        keypoints = None if self.keypoint_filter is None else self.keypoint_filter.predict(ids, boxes)
+
+        self.results = Detections(boxes, classes, scores, ids, keypoints)
+
+        return ids, boxes, traces
 
-    def _check_stability_with(self, prev_boxes, prev_tracks):
-        curr_boxes = self.results.boxes.xyxy.numpy()
-        if len(curr_boxes) == 0 or len(prev_boxes) != len(curr_boxes):
+    def _check_stability_with(self, prev_state, curr_state):
+        prev_ids, prev_boxes, prev_traces = prev_state
+        curr_ids, curr_boxes, curr_traces = curr_state
+
+        if len(curr_ids) == 0 or len(prev_ids) != len(curr_ids):
             return False
-    
-        if len(prev_tracks) == 0 or len(prev_tracks) != len(self.tracks):
+
+        # Emparejamos por track_id, no por posicion en la lista
+        prev_order = np.argsort(prev_ids)
+        curr_order = np.argsort(curr_ids)
+        if not np.array_equal(prev_ids[prev_order], curr_ids[curr_order]):
             return False
-        
-        for prev, curr in zip(prev_boxes, curr_boxes):
-            # 1. motion constraint
-            motion = np.linalg.norm(curr[:2] - prev[:2])
-            if motion > self.motion_thresh:
-                return False
-
-            # 2. area stability
-            prev_area = (prev[2]-prev[0])*(prev[3]-prev[1])
-            curr_area = (curr[2]-curr[0])*(curr[3]-curr[1])
-            if curr_area > prev_area * self.area_thresh or curr_area < prev_area / self.area_thresh:
-                return False
-
-        for prev, curr in zip(prev_tracks, self.tracks):
-            # 3. covariance trace
-            if np.trace(curr.covariance) > np.trace(prev.covariance) * self.cov_increase:
-                return False
 
-        return True
+        prev = prev_boxes[prev_order]
+        curr = curr_boxes[curr_order]
+
+        # 1. motion constraint
+        motion = np.linalg.norm(curr[:, :2] - prev[:, :2], axis=1)
+
+        # 2. area stability
+        prev_area = (prev[:, 2] - prev[:, 0]) * (prev[:, 3] - prev[:, 1])
+        curr_area = (curr[:, 2] - curr[:, 0]) * (curr[:, 3] - curr[:, 1])
+
+        # 3. covariance trace, acumulada desde la ultima inferencia: paso a paso crece siempre
+        # lo mismo (~2.6x el primero) y un umbral por paso no distingue nada
+        ref_ids, _, ref_traces = self.follow_reference or prev_state
+        ref_order = np.argsort(ref_ids)
+        if not np.array_equal(ref_ids[ref_order], curr_ids[curr_order]):
+            return False
+        cov_growth_ok = curr_traces[curr_order] <= ref_traces[ref_order] * self.cov_increase
 
-    def _make_following(self, frame_copy):
-        prev_boxes = self.results.boxes.xyxy.numpy()
-        prev_tracks = self.tracks
-        
-        self._interpolate(frame_copy, self.results.path)
-
-        self.is_following_stable = self._check_stability_with(prev_boxes, prev_tracks)
-
-    def _make_inference(self, frame_copy):
-        inference = self.model.track(
-            frame_copy, 
-            imgsz=320, 
-            conf=0.5, 
-            verbose=False,
-            persist=True,
-            tracker="bytetracker.yaml"
+        return bool(
+            np.all(motion <= self.motion_thresh)
+            and np.all(curr_area <= prev_area * self.area_thresh)
+            and np.all(curr_area >= prev_area / self.area_thresh)
+            and np.all(cov_growth_ok)
         )
+
+    def _make_following(self, frame):
+        # Snapshot antes de predecir: multi_predict modifica los tracks in-place
+        prev_state = self._track_state(self.tracks)
+        if self.follow_reference is None:
+            self.follow_reference = prev_state
+        curr_state = self._interpolate(frame)
+
+        self.is_following_stable = self._check_stability_with(prev_state, curr_state)
+
+    def _predict(self, tensor):
+        return self.model.predict(
+            tensor,
+            imgsz=IMGSZ,
+            conf=CONF_THRESH,
+            verbose=False
+        )
+
+    def _roi(self, frame):
+        # Recorte cuadrado alrededor de las cajas trackeadas del control; None -> frame completo
+        source = self.roi_source
+        if source is None or source.results is None or len(source.tracks) == 0:
+            return None
+
+        boxes = source.results.boxes
+        if len(boxes) == 0:
+            return None
+
+        x1, y1 = boxes[:, :2].min(axis=0)
+        x2, y2 = boxes[:, 2:].max(axis=0)
+        h, w = frame.shape[:2]
+
+        side = max(x2 - x1, y2 - y1) * self.roi_expand
+        side = int(max(side, ROI_MIN_SIZE))
+        if side >= min(h, w) * ROI_MAX_FRACTION:
+            return None
+
+        # Centrado en el control y desplazado (no achicado) para quedar dentro del frame
+        left = int(np.clip((x1 + x2 - side) / 2, 0, w - side))
+        top = int(np.clip((y1 + y2 - side) / 2, 0, h - side))
+        return left, top, left + side, top + side
+
+    def model_input(self, prepared):
+        roi = self._roi(prepared.frame)
+        if roi is None:
+            return prepared
+
+        self.recorder.count("roi_inferences")
+        return prepared.crop(roi)
+
+    def _track(self, prediction, frame, model_input):
+        # Volvemos del espacio letterbox al frame original (o al recorte) antes de trackear
+        input_shape = model_input.frame.shape
+        ratio_pad = model_input.ratio_pad
+        offset = np.zeros(2) if model_input.roi is None else np.array(model_input.roi[:2], dtype=float)
+
+        detections = prediction.boxes.data.cpu().numpy().copy()
+        detections[:, :4] = ops.scale_boxes(prediction.orig_shape, detections[:, :4], input_shape, ratio_pad=ratio_pad)
+        detections[:, :4] += np.tile(offset, 2)
+
+        tracks = self.tracker.update(Boxes(detections, frame.shape[:2]), frame)
+        self.tracks = [t for t in self.tracker.tracked_stracks if t.is_activated]
+        # La ultima columna de cada track es el indice de su deteccion en este frame
+        self.inference_boxes = detections[tracks[:, -1].astype(int), :4] if len(tracks) else detections[:0, :4]
+
+        keypoints = None
+        if prediction.keypoints is not None:
+            kpts = prediction.keypoints.data.cpu().numpy().copy()
+            kpts[..., :2] = ops.scale_coords(prediction.orig_shape, kpts[..., :2], input_shape, ratio_pad=ratio_pad)
+            kpts[..., :2] += offset
+            keypoints = kpts[tracks[:, -1].astype(int)] if len(tracks) else kpts[:0]
+            if self.keypoint_filter is not None:
+                keypoints = self.keypoint_filter.update(tracks[:, 4], tracks[:, :4], keypoints, model_input.timestamp)
+
+        self.results = Detections.from_tracks(tracks, keypoints)
+        return len(tracks) > 0
+
+    def is_torn(self, prepared):
+        # True si la camara piso el frame mientras se leian sus pixeles (letterbox, recorte, miniatura).
+        # Se llama despues de la ultima lectura y antes del forward; en el worker no hay buffer
+        frame_buffer = getattr(self.context, "frame_buffer", None)
+        if frame_buffer is None or frame_buffer.still_valid(prepared.frame_id):
+            return False
+        self.recorder.count("torn_frames")
+        return True
+
+    def _make_inference(self, prepared):
+        model_input = self.model_input(prepared)
+        tensor = model_input.tensor
+        if self.is_torn(prepared):
+            return None
+        inference = self._predict(tensor)
         if inference:
-            self.results = inference[0]
-            if  len(self.results.boxes) == 0:
-                return False
-            
+            return self._track(inference[0], prepared.frame, model_input)
+
         return True
 
+    def _reuse_static(self, prepared):
+        if self.motion_gate is None or not self.has_detections or self.results is None:
+            return False
+
+        decision = self.motion_gate.check(prepared.thumbnail)
+        if decision is not None:
+            self.recorder.count(f"motion_{decision}")
+        return decision == "reused"
+
+    def begin_step(self, prepared):
+        # Sigue con el Kalman si puede; devuelve True si el frame necesita inferencia completa
+        self.recorder.picked_up(prepared.frame_id)
+        self.steps += 1
+
+        if self._reuse_static(prepared):
+            return False
+
+        if self.is_trackable and self.results is not None and self.scheduler.should_follow(len(self.tracks) > 0):
+            start = time.perf_counter()
+            self._make_following(prepared.frame)
+            self.scheduler.record_follow(time.perf_counter() - start, self.is_following_stable)
+            self.recorder.count("follows")
+
+            if not self.is_following_stable:
+                self.is_trackable = False
+                self.recorder.count("unstable")
+        else:
+            self.is_trackable = False
+
+        if not self.is_trackable and self.motion_gate is not None:
+            # El motion gate compara contra el ultimo frame que paso por YOLO
+            self.motion_gate.update(prepared.thumbnail)
+
+        return not self.is_trackable
+
+    def finish_inference(self, has_detections, latency):
+        self.has_detections = has_detections
+        self.follow_reference = None
+        self.scheduler.record_inference(latency, self._inference_motion())
+        self.is_trackable = self.has_detections
+        self.recorder.count("inferences")
+
+    def apply_inference(self, prepared, model_input, prediction, forward_latency):
+        # Prediccion de un forward en batch: el tracker de este stream se actualiza por separado
+        start = time.perf_counter()
+        has_detections = self._track(prediction, prepared.frame, model_input)
+        self.finish_inference(has_detections, forward_latency + time.perf_counter() - start)
+
+    def end_step(self, prepared):
+        self.recorder.processed()
+
+        if self.results is not None:
+            # Los resultados reusados (motion gate) ya se publicaron: se copian con el frame nuevo
+            self.results = self.results.for_frame(prepared.frame_id, prepared.timestamp)
+
+        if self.has_detections:
+            self.empty_frames = 0
+            return 0
+
+        # Esperar si no hay detecciones
+        if self.empty_frames < (self.max_wait_fps // 2):
+            self.empty_frames += 1
+        cooldown = min(2 ** self.empty_frames, self.max_wait_fps) # Exponential wait
+        self.recorder.count("backoff_sleeps")
+        return cooldown * 0.01
+
+    def step(self, prepared):
+        if self.begin_step(prepared):
+            # Procesar detección
+            start = time.perf_counter()
+            has_detections = self._make_inference(prepared)
+            if has_detections is None:
+                # Frame pisado: ni tracker ni resultados; None = no publicar
+                return None
+            self.finish_inference(has_detections, time.perf_counter() - start)
+
+        return self.end_step(prepared)
+
+    def scheduler_stats(self):
+        stats = self.scheduler.stats()
+        if self.motion_gate is not None:
+            stats["motion_gate"] = self.motion_gate.stats()
+        return stats
+
+    def publish(self):
+        # Detections solo tiene arrays NumPy: se publica tal cual, sin frame ni tensores
+        self.context.mutex[self.thread_name].update(self.results)
+        self.recorder.published()
+
     def run(self):
-        last_detection_time = time.time()
-        frames_since_detection = 0
-        is_trackable = False
-        detection = False
-        empty_frames = 0
+        frame_id = 0
 
         while self.context.running:
-            current_time = time.time()
-
-            #Limitamos FPS en la deteccion
-            if current_time - last_detection_time >= self.context.frame_time:
-                current_frame = self.context.mutex["current_frame"].get()
-
-                if current_frame is not None:
-                    frame_copy = current_frame.copy()
-                    if is_trackable and self.results is not None:
-                        self._make_following(frame_copy)
-                        
-                        if self.is_following_stable and frames_since_detection < self.max_stride:
-                            frames_since_detection += 1
-                        else:
-                            is_trackable = False
-                    
-                    if not is_trackable:
-                        # Procesar detección
-                        detection = self._make_inference(frame_copy) and self.max_stride > 1
-                        frames_since_detection = 0
-                        is_trackable = detection
-                    
-                    # Actualizar resultados
-                    self.context.mutex[self.thread_name].update(self.results)
-                    last_detection_time = current_time
-                    
-                    if detection:
-                        empty_frames = 0
-                        
-                    else:
-                        # Esperar si no hay detecciones
-                        if empty_frames < (self.max_wait_fps // 2):
-                            empty_frames += 1
-                        cooldown = min(2 ** empty_frames, self.max_wait_fps) # Exponential wait
-                        time.sleep(cooldown * 0.01)
-            else:
-                time.sleep(0.01)
\ No newline at end of file
+            # Bloquea hasta que la camara publique un frame nuevo (o hasta el cierre)
+            frame_id, current_frame = self.context.frame_buffer.wait_after(frame_id)
+
+            if current_frame is not None:
+                timestamp = self.context.frame_buffer.write_time(frame_id)
+                cooldown = self.step(PreparedFrame(current_frame, frame_id, timestamp=timestamp))
+                if cooldown is None:
+                    # Frame pisado por la camara antes del forward: se descarta
+                    continue
+
+                # Actualizar resultados
+                self.publish()
+
+                if cooldown:
+                    self.context.stop_event.wait(cooldown)
@@ -1,41 +1,165 @@
+import threading
 import time
+import cv2
+import numpy as np
 import mediapipe as mp
 from mediapipe.tasks.python import vision
 
 from threads import YOLODetectorThread
+from detections import Detections
+from pipeline_stats import NULL_STATS
+from preprocessing import PreparedFrame
+
+MODEL_PATH = "models/hand_landmarker.task"
+RUNNING_MODES = {
+    # Sincronico, frame a frame: despues del primero MediaPipe sigue las manos en lugar de buscar palmas
+    "video": vision.RunningMode.VIDEO,
+    # Asincronico: el resultado llega por callback y MediaPipe descarta frames si se atrasa
+    "live_stream": vision.RunningMode.LIVE_STREAM,
+}
+HAND_NAMES = {0: "Left", 1: "Right"}
+NUM_HANDS = 2
+MIN_CONFIDENCE = 0.5
+NUM_LANDMARKS = 21
 
 class HandsThread(YOLODetectorThread):
-    detection = None
+    """Motor de manos alternativo a hand_model.pt: HandLandmarker de MediaPipe en modo VIDEO o LIVE_STREAM.
+
+    Publica Detections con la misma forma que el modelo YOLO de manos: cajas a partir de
+    los landmarks y keypoints (N, 21, 3) en pixeles. MediaPipe no da ids de track; se usa
+    la lateralidad (0 izquierda, 1 derecha), estable mientras MediaPipe sigue a la mano.
+    """
 
-    def __init__(self, YOLODetector):
+    def __init__(self, YOLODetector, thread_name="hands", mode="video", model_path=MODEL_PATH, num_hands=NUM_HANDS, min_confidence=MIN_CONFIDENCE):
         super().__init__(YOLODetector)
+
+        self.thread_name = thread_name
+        self.names = HAND_NAMES
+        self.mode = mode
+        self.live = mode == "live_stream"
+        self.results = None
+
         options = vision.HandLandmarkerOptions(
-            base_options=mp.tasks.BaseOptions(model_asset_path="models/hand_landmarker.task"),
-            running_mode=vision.RunningMode.IMAGE,
-            # min_hand_detection_confidence=0.5,
-            # min_hand_presence_confidence=0.5,
-            # min_tracking_confidence=0.5,
-            num_hands=2
+            base_options=mp.tasks.BaseOptions(model_asset_path=model_path),
+            running_mode=RUNNING_MODES[mode],
+            num_hands=num_hands,
+            min_hand_detection_confidence=min_confidence,
+            min_hand_presence_confidence=min_confidence,
+            min_tracking_confidence=min_confidence,
+            result_callback=self._on_result if self.live else None
         )
-        self.hand_recognizer = vision.HandLandmarker.create_from_options(options)
+        self.hand_landmarker = vision.HandLandmarker.create_from_options(options)
+
+        self.rgb = None
+        self.last_timestamp_ms = -1
+        # LIVE_STREAM: timestamp_ms -> (frame_id, timestamp, shape) de los frames en vuelo
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+
+        self.frames = 0
+        self.inferences = 0
+        self.dropped = 0
+
+        self.recorder = getattr(YOLODetector, "stats", NULL_STATS).detector(thread_name)
+
+    def _timestamp_ms(self, timestamp):
+        # MediaPipe exige timestamps estrictamente crecientes; usamos el monotonic de la captura
+        ms = int((time.monotonic() if timestamp is None else timestamp) * 1000)
+        ms = max(ms, self.last_timestamp_ms + 1)
+        self.last_timestamp_ms = ms
+        return ms
+
+    def _image(self, frame):
+        # El buffer entrega BGR de solo lectura: la unica pasada es la conversion a RGB, sobre un buffer reusado
+        if self.rgb is None or self.rgb.shape != frame.shape:
+            self.rgb = np.empty_like(frame)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        return mp.Image(image_format=mp.ImageFormat.SRGB, data=self.rgb)
+
+    def _to_detections(self, result, shape):
+        if not result.hand_landmarks:
+            return Detections(keypoints=np.zeros((0, NUM_LANDMARKS, 3), dtype=np.float32))
+
+        h, w = shape[:2]
+        points = np.array([[(lm.x, lm.y) for lm in hand] for hand in result.hand_landmarks], dtype=np.float32)
+        points *= np.array([w, h], dtype=np.float32)
+
+        handedness = [hand[0] for hand in result.handedness]
+        classes = np.array([1 if category.category_name == "Right" else 0 for category in handedness], dtype=np.int32)
+        scores = np.array([category.score for category in handedness], dtype=np.float32)
+
+        # Sin confianza por landmark: todos llevan la de la mano
+        confidences = np.broadcast_to(scores[:, None, None], points.shape[:2] + (1,))
+        keypoints = np.concatenate((points, confidences), axis=2)
+        boxes = np.hstack((points.min(axis=1), points.max(axis=1)))
+
+        return Detections(boxes, classes, scores, classes, keypoints)
+
+    def _on_result(self, result, image, timestamp_ms):
+        # Hilo de MediaPipe (LIVE_STREAM): los frames que descarto quedan atras en pending
+        with self.pending_lock:
+            frame = self.pending.pop(timestamp_ms, None)
+            for stale in [ts for ts in self.pending if ts < timestamp_ms]:
+                del self.pending[stale]
+                self.dropped += 1
+        if frame is None:
+            return
+
+        frame_id, timestamp, shape = frame
+        self.inferences += 1
+        self.recorder.count("inferences")
+        self.results = self._to_detections(result, shape).for_frame(frame_id, timestamp)
+        self.recorder.processed()
+        self.publish()
+
+    def step(self, prepared):
+        self.recorder.picked_up(prepared.frame_id)
+        self.frames += 1
+
+        image = self._image(prepared.frame)
+        if not self.context.frame_buffer.still_valid(prepared.frame_id):
+            # La camara piso el frame durante la conversion a RGB: no llega a MediaPipe
+            self.recorder.count("torn_frames")
+            return None
+        timestamp_ms = self._timestamp_ms(prepared.timestamp)
+
+        if self.live:
+            with self.pending_lock:
+                self.pending[timestamp_ms] = (prepared.frame_id, prepared.timestamp, prepared.frame.shape)
+            self.hand_landmarker.detect_async(image, timestamp_ms)
+            return 0
+
+        result = self.hand_landmarker.detect_for_video(image, timestamp_ms)
+        self.inferences += 1
+        self.recorder.count("inferences")
+        self.results = self._to_detections(result, prepared.frame.shape).for_frame(prepared.frame_id, prepared.timestamp)
+        self.recorder.processed()
+        return 0
+
+    def scheduler_stats(self):
+        return {"engine": "mediapipe", "mode": self.mode, "frames": self.frames, "inferences": self.inferences, "dropped": self.dropped}
+
+    def publish(self):
+        self.context.mutex[self.thread_name].update(self.results)
+        self.recorder.published()
 
-    def detect_hands(self, frame):
-        mp_frame = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame)
-        self.detection = self.hand_recognizer.detect(mp_frame)
+    def close(self):
+        self.hand_landmarker.close()
 
     def run(self):
-        last_detection_time = time.time()
+        frame_id = 0
 
-        while self.context.running:
-            current_time = time.time()
-            if current_time - last_detection_time >= self.context.frame_time:
-                frame_copy = self.mutex["current_frame"].get()
-                if frame_copy is not None:
+        try:
+            while self.context.running:
+                # Bloquea hasta que la camara publique un frame nuevo (o hasta el cierre)
+                frame_id, current_frame = self.context.frame_buffer.wait_after(frame_id)
 
-                    self.detect_hands(frame_copy)
-                    self.draw_landmarks(frame_copy)
+                if current_frame is not None:
+                    timestamp = self.context.frame_buffer.write_time(frame_id)
+                    published = self.step(PreparedFrame(current_frame, frame_id, timestamp=timestamp))
 
-                    self.mutex["hands_detection"].update(self.detection)
-                    last_detection_time = current_time
-            else:
-                time.sleep(0.01)
\ No newline at end of file
+                    # En LIVE_STREAM publica el callback; None = frame descartado
+                    if published is not None and not self.live:
+                        self.publish()
+        finally:
+            self.close()
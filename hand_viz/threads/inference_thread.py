@@ -0,0 +1,138 @@
+import time
+import torch
+
+from threads import YOLODetectorThread
+from preprocessing import PreparedFrame
+from frame_buffer import wait_any
+from batching import BatchStats, MAX_WAIT, predict_batch
+
+class InferenceThread(YOLODetectorThread):
+    """Pool de inferencia compartido por todas las fuentes.
+
+    Cada ronda toma el ultimo frame de cada stream (nunca la cola de frames viejos),
+    corre los seguimientos con Kalman por separado y junta en un solo forward por
+    modelo los frames que necesitan inferencia completa. Los trackers son por stream.
+    """
+
+    def __init__(self, YOLODetector, streams, num_threads=None, max_batch=None, max_wait=MAX_WAIT):
+        super().__init__(YOLODetector)
+
+        self.streams = streams
+        self.num_threads = num_threads
+        # Frames por forward (a lo sumo uno por stream); None = todas las fuentes
+        self.max_batch = max_batch or len(streams)
+        # Cuanto esperamos, despues del primer frame, a que otras fuentes completen el batch
+        self.max_wait = max_wait if len(streams) > 1 else 0
+
+        self.detectors = [detector for stream in streams for detector in stream.detectors]
+        self.resume_time = {detector: 0 for detector in self.detectors}
+        self.frame_ids = {stream: 0 for stream in streams}
+        self.served_time = {stream: 0 for stream in streams}
+        self.batch_stats = {detector.thread_name: BatchStats() for detector in self.detectors}
+
+        # Todos los modelos de todas las fuentes comparten el frame: cada uno tiene su parte de frame_time
+        for detector in self.detectors:
+            detector.scheduler.frame_time = self.context.frame_time / len(self.detectors)
+
+    def _active_streams(self, current_time):
+        # Fuentes con algun modelo fuera del backoff por falta de detecciones
+        return [
+            stream for stream in self.streams
+            if any(current_time >= self.resume_time[detector] for detector in stream.detectors)
+        ]
+
+    def _wait_frames(self, streams):
+        buffers = [stream.frame_buffer for stream in streams]
+        seqs = [self.frame_ids[stream] for stream in streams]
+        condition = buffers[0].new_frame
+
+        # Bloquea hasta un frame nuevo en alguna fuente: no repetimos inferencia sobre el mismo frame
+        wait_any(buffers, seqs, condition)
+
+        # Margen corto para que el resto de las fuentes llegue al mismo forward
+        batch = min(self.max_batch, len(streams))
+        if self.max_wait > 0 and batch > 1:
+            wait_any(buffers, seqs, condition, timeout=self.max_wait, count=batch)
+
+    def _collect(self, streams):
+        # Fairness: primero las fuentes atendidas hace mas tiempo; una fuente rapida aporta
+        # a lo sumo un frame por ronda y las que no entran quedan primeras para la siguiente
+        ready = []
+        for stream in sorted(streams, key=self.served_time.get):
+            if len(ready) >= self.max_batch:
+                break
+
+            frame_id, current_frame = stream.frame_buffer.latest_after(self.frame_ids[stream])
+            if current_frame is None:
+                continue
+
+            self.frame_ids[stream] = frame_id
+            self.served_time[stream] = time.monotonic()
+            # Letterbox y normalizacion una sola vez para todos los modelos del stream
+            timestamp = stream.frame_buffer.write_time(frame_id)
+            ready.append((stream, PreparedFrame(current_frame, frame_id, timestamp=timestamp)))
+
+        return ready
+
+    def _infer(self, pending, torn):
+        # pending: [(detector, prepared)] del mismo modelo -> un solo forward para todo el batch.
+        # La entrada se arma recien aca: el recorte ROI de las manos usa el control de este mismo frame
+        # Los tensores se arman antes del forward: un frame que la camara piso mientras se leia
+        # queda afuera del batch, no toca el tracker y no se publica
+        inputs = []
+        for detector, prepared in pending:
+            model_input = detector.model_input(prepared)
+            model_input.tensor
+            if detector.is_torn(prepared):
+                torn.add(detector)
+            else:
+                inputs.append((detector, prepared, model_input))
+        if not inputs:
+            return
+
+        predictions, forward_latency = predict_batch(inputs[0][0], [model_input for _, _, model_input in inputs], self.batch_stats[inputs[0][0].thread_name])
+
+        # Cada stream paga su parte del forward compartido mas su propio tracking
+        for (detector, prepared, model_input), prediction in zip(inputs, predictions):
+            detector.apply_inference(prepared, model_input, prediction, forward_latency)
+
+    def stats(self):
+        return {name: batch_stats.stats() for name, batch_stats in self.batch_stats.items()}
+
+    def run(self):
+        # Los modelos corren de a uno, asi cada forward usa todo el pool intra-op de torch
+        if self.num_threads is not None:
+            torch.set_num_threads(self.num_threads)
+
+        while self.context.running:
+            # Si todos los modelos estan en espera por falta de detecciones, dormimos hasta el primero
+            idle_time = min(self.resume_time.values()) - time.time()
+            if idle_time > 0:
+                self.context.stop_event.wait(idle_time)
+                continue
+
+            streams = self._active_streams(time.time())
+            self._wait_frames(streams)
+
+            current_time = time.time()
+            steps = []
+            pending = {}
+            for stream, prepared in self._collect(streams):
+                for detector in stream.detectors:
+                    if current_time < self.resume_time[detector]:
+                        continue
+
+                    steps.append((detector, prepared))
+                    if detector.begin_step(prepared):
+                        pending.setdefault(detector.thread_name, []).append((detector, prepared))
+
+            torn = set()
+            for batch in pending.values():
+                self._infer(batch, torn)
+
+            for detector, prepared in steps:
+                if detector in torn:
+                    continue
+                cooldown = detector.end_step(prepared)
+                detector.publish()
+                self.resume_time[detector] = time.time() + cooldown
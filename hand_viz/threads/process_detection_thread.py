@@ -0,0 +1,150 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import torch
+
+from threads import YOLODetectorThread
+from threads.detection_thread import DetectionThread
+from preprocessing import PreparedFrame
+from pipeline_stats import NULL_STATS
+
+def _worker_main(connection, model_path, thread_name, detector_kwargs, num_threads):
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+
+    # El DetectionThread vive entero en el worker: inferencia, NMS, ByteTrack y Kalman
+    detector = DetectionThread(None, model_path, thread_name, **detector_kwargs)
+    connection.send(detector.names)
+
+    shm = None
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+
+        shm_name, shape, frame_id, timestamp = message
+        if shm is None or shm.name != shm_name:
+            if shm is not None:
+                shm.close()
+            shm = shared_memory.SharedMemory(name=shm_name)
+
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        cooldown = detector.step(PreparedFrame(frame, frame_id, timestamp=timestamp))
+
+        # Detections es solo arrays: se pickla chico y no referencia la memoria compartida
+        connection.send((cooldown, detector.results, detector.scheduler_stats()))
+
+    if shm is not None:
+        shm.close()
+    connection.close()
+
+class ProcessDetectionThread(YOLODetectorThread):
+    def __init__(self, YOLODetector, model_path, thread_name, num_threads=None, **detector_kwargs):
+        super().__init__(YOLODetector)
+
+        self.thread_name = thread_name
+        self.results = None
+        self.shm = None
+        self.stats = {}
+        self.recorder = getattr(YOLODetector, "stats", NULL_STATS).detector(thread_name)
+
+        ctx = mp.get_context("spawn")
+        self.connection, child_connection = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_connection, model_path, thread_name, detector_kwargs, num_threads),
+            daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+
+        # El worker responde con los nombres de clases cuando termina de cargar el modelo
+        self.names = self.connection.recv()
+
+    def _ensure_shm(self, frame):
+        if self.shm is None or self.shm.size < frame.nbytes:
+            if self.shm is not None:
+                self.shm.close()
+                self.shm.unlink()
+            self.shm = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+        return np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    def _count_steps(self, previous, current):
+        # El recorder vive en este proceso: los contadores salen de las diferencias del scheduler del worker
+        for counter in ("inferences", "follows"):
+            self.recorder.count(counter, current[counter] - previous.get(counter, 0))
+        unstable = previous.get("forced_inferences", {}).get("unstable", 0)
+        self.recorder.count("unstable", current["forced_inferences"]["unstable"] - unstable)
+
+        if "motion_gate" in current:
+            for decision in ("reused", "moved", "stale"):
+                count = previous.get("motion_gate", {}).get(decision, 0)
+                self.recorder.count(f"motion_{decision}", current["motion_gate"][decision] - count)
+
+    def step(self, prepared):
+        self.recorder.picked_up(prepared.frame_id)
+
+        frame = prepared.frame
+        np.copyto(self._ensure_shm(frame), frame)
+        if not self.context.frame_buffer.still_valid(prepared.frame_id):
+            # La camara piso el frame durante la copia a la memoria compartida: no llega al worker
+            self.recorder.count("torn_frames")
+            return None
+        self.connection.send((self.shm.name, frame.shape, prepared.frame_id, prepared.timestamp))
+
+        previous = self.stats
+        cooldown, self.results, self.stats = self.connection.recv()
+        # Incluye el ida y vuelta por el pipe
+        self.recorder.processed()
+        self._count_steps(previous, self.stats)
+        if cooldown:
+            self.recorder.count("backoff_sleeps")
+
+        return cooldown
+
+    def scheduler_stats(self):
+        # El scheduler vive en el worker; devolvemos lo ultimo que reporto
+        return self.stats
+
+    def publish(self):
+        self.context.mutex[self.thread_name].update(self.results)
+        self.recorder.published()
+
+    def close(self):
+        if self.process.is_alive():
+            try:
+                self.connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout=2.0)
+            if self.process.is_alive():
+                self.process.terminate()
+
+        self.connection.close()
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def run(self):
+        frame_id = 0
+
+        try:
+            while self.context.running:
+                # Bloquea hasta que la camara publique un frame nuevo (o hasta el cierre)
+                frame_id, current_frame = self.context.frame_buffer.wait_after(frame_id)
+
+                if current_frame is not None:
+                    timestamp = self.context.frame_buffer.write_time(frame_id)
+                    cooldown = self.step(PreparedFrame(current_frame, frame_id, timestamp=timestamp))
+                    if cooldown is None:
+                        # Frame descartado antes de llegar al worker
+                        continue
+
+                    # Actualizar resultados
+                    self.publish()
+
+                    if cooldown:
+                        self.context.stop_event.wait(cooldown)
+        finally:
+            self.close()
@@ -0,0 +1,95 @@
+import cv2
+import numpy as np
+import time
+
+from threads import YOLODetectorThread
+
+CANVAS_SHAPE = (480, 640, 3) # Sin video original dibujamos sobre un frame negro
+
+class ReplayThread(YOLODetectorThread):
+    """Reproduce un log de resultados (result_log) publicandolo en los streams como si fueran detectores.
+
+    Los resultados salen en el orden en que se publicaron; speed escala el tiempo
+    entre ellos (0 = lo mas rapido posible). Como el log no guarda frames, cada frame_id
+    nuevo escribe en el buffer del stream el frame del video original o un lienzo vacio.
+    """
+
+    def __init__(self, YOLODetector, channels, speed=1.0, videos=None):
+        super().__init__(YOLODetector)
+        self.channels = channels
+        self.speed = speed
+        self.videos = videos or {}
+
+        self.streams = {stream.name: stream for stream in YOLODetector.streams}
+        self.captures = {}
+        self.video_pos = {}
+        # frame_id del log -> seq en el buffer del stream, por stream
+        self.frame_seqs = {name: {} for name in self.streams}
+
+    def _events(self):
+        # (publicado, canal, fila) de todos los canales, en orden de publicacion
+        times = [channel.published_at for channel in self.channels]
+        channel_index = np.concatenate([np.full(len(t), i) for i, t in enumerate(times)])
+        rows = np.concatenate([np.arange(len(t)) for t in times])
+        times = np.concatenate(times)
+        order = np.argsort(times, kind="stable")
+        return times[order], channel_index[order], rows[order]
+
+    def _read_frame(self, stream_name, frame_id):
+        capture = self.captures.get(stream_name)
+        if capture is None:
+            return np.zeros(CANVAS_SHAPE, dtype=np.uint8)
+
+        # Los frame_id son la secuencia de captura (1 = primer frame del video)
+        frame = None
+        while self.video_pos[stream_name] < frame_id:
+            ret, frame = capture.read()
+            if not ret:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = capture.read()
+                if not ret:
+                    return np.zeros(CANVAS_SHAPE, dtype=np.uint8)
+            self.video_pos[stream_name] += 1
+        return frame
+
+    def _frame_seq(self, stream, frame_id):
+        seqs = self.frame_seqs[stream.name]
+        if frame_id not in seqs:
+            if seqs and frame_id < max(seqs):
+                # Resultado de un frame que ya pasamos: lo mostramos sobre el ultimo
+                return stream.frame_buffer.seq
+            frame = self._read_frame(stream.name, frame_id)
+            if frame is None:
+                return stream.frame_buffer.seq
+            seqs[frame_id] = stream.frame_buffer.write(frame)
+            # Solo hacen falta los frames que siguen en el buffer
+            for old in [old for old in seqs if seqs[old] <= seqs[frame_id] - stream.frame_buffer.size]:
+                del seqs[old]
+        return seqs[frame_id]
+
+    def run(self):
+        for stream_name, video in self.videos.items():
+            self.captures[stream_name] = cv2.VideoCapture(video)
+            self.video_pos[stream_name] = 0
+
+        times, channel_index, rows = self._events()
+        stop_event = self.context.stop_event
+        start = time.monotonic()
+
+        for published_at, i, row in zip(times.tolist(), channel_index.tolist(), rows.tolist()):
+            if stop_event.is_set():
+                break
+
+            if self.speed > 0:
+                remaining = (published_at - times[0]) / self.speed - (time.monotonic() - start)
+                if remaining > 0 and stop_event.wait(remaining):
+                    break
+
+            channel = self.channels[i]
+            stream = self.streams[channel.stream]
+            detections = channel.detections(row)
+            seq = self._frame_seq(stream, detections.frame_id)
+            stream.mutex[channel.model].update(detections.for_frame(seq, detections.timestamp))
+
+        for capture in self.captures.values():
+            capture.release()
@@ -1,22 +1,45 @@
+import argparse
 import cv2
+import json
 import threading
 import time
 import os
 
-from threads import CameraThread, DetectionThread
+from threads import CameraThread, DetectionThread, HandsThread, InferenceThread, ProcessDetectionThread, ReplayThread
+from threads.hands_thread import RUNNING_MODES
+from frame_buffer import FrameRingBuffer
+from model_backend import BACKENDS, load_model
+from batching import MAX_WAIT
+from motion_gate import MAX_STALENESS
+from overlay import OverlayRenderer
+from pipeline_stats import PipelineStats, NULL_STATS
+from result_log import ResultLogWriter, load_log
+from result_stream import ResultServer, SOCKET_PATH
+from input_mapper import InputMapper
 
 MODELS_DIR = os.path.join("./models")
+WINDOW_TITLE = "Detector de joystick"
 
 class MutexValue():
-    def __init__(self, value=None):
+    def __init__(self, value=None, event=None):
         self.lock = threading.Lock()
         self.value = value
         self.default = value
+        self.event = event
+        # Callbacks con cada valor publicado (log de resultados, socket); no deben bloquear
+        self.sinks = []
 
     def update(self, new_value):
         with self.lock:
             self.value = new_value
 
+        # Avisamos a quien espere un resultado nuevo (el renderer)
+        if self.event is not None:
+            self.event.set()
+
+        for sink in self.sinks:
+            sink(new_value)
+
     def get(self):
         copy = self.default
         with self.lock:
@@ -24,116 +47,431 @@ class MutexValue():
         
         return copy
 
-class JoystickDetector:
-    def __init__(self):
+class Stream:
+    """Una fuente de video con su buffer de frames, sus resultados y sus trackers."""
+
+    def __init__(self, detector, name, source):
+        self.name = name
+        self.source = source
 
-        self.running = True
+        self.stop_event = detector.stop_event
+        self.results_ready = detector.results_ready
+        self.frame_time = detector.frame_time
+
+        # Frame ids por stream: cada fuente lleva sus propios timestamps y contadores
+        self.stats = PipelineStats() if detector.stats_enabled else NULL_STATS
+
+        # Todas las fuentes avisan por la misma condicion al pool de inferencia
+        self.frame_buffer = FrameRingBuffer(condition=detector.new_frame)
+        self.display_frame = None
 
         self.mutex = {
-            "current_frame": MutexValue(),
-            "controller": MutexValue(),
-            "hands": MutexValue()
+            "controller": MutexValue(event=self.results_ready),
+            "hands": MutexValue(event=self.results_ready)
         }
 
+        self.threads = {}
+        self.detectors = []
+        # Nombres de clase por modelo, para las etiquetas
+        self.names = {}
+        self.mapper = None
+
+    def publish_to(self, target):
+        # target.channel(stream, modelo, nombres) -> callback (ResultLogWriter, ResultServer)
+        for model, mutex in self.mutex.items():
+            mutex.sinks.append(target.channel(self.name, model, self.names[model]))
+
+    def map_inputs(self, mapper, listener=None):
+        # Cada resultado de manos se cruza con el ultimo del control, en el hilo que lo publica
+        self.mapper = mapper
+        controller = self.mutex["controller"]
+
+        def on_hands(hands):
+            for event in mapper.update(controller.get(), hands):
+                if listener is not None:
+                    listener(self, event)
+
+        self.mutex["hands"].sinks.append(on_hands)
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set()
+
+class JoystickDetector:
+    def __init__(self, sources=(0,), executor="thread", backend="torch", stats=False, stats_overlay=False, max_batch=None, max_wait=MAX_WAIT, hands_roi=False, motion_gate=False, max_staleness=MAX_STALENESS, smooth_keypoints=False, hand_engine="yolo", mediapipe_mode="video", log_dir=None, replay=None, replay_speed=1.0, replay_videos=None, headless=False, socket_path=None, map_inputs=False, zone_classes=None):
+
+        # Timestamps por frame y contadores por detector; deshabilitado es un no-op
+        self.stats_enabled = stats or stats_overlay
+        self.stats_overlay = stats_overlay
+
+        self.stop_event = threading.Event()
+        self.results_ready = threading.Event()
+        self.new_frame = threading.Condition(threading.Lock())
+
         self.target_fps = 30  
         self.frame_time = 1.0 / self.target_fps
 
         self.fps_count = 0
         self.fps = 0
+        self.overlay = OverlayRenderer()
+
+        self.running_threads = []
+        self.result_log = None
+        self.result_server = None
+        # Sin ventanas: los resultados solo salen por el socket y/o el log
+        self.headless = headless
+
+        if replay is not None:
+            # Sin modelos ni camaras: los resultados salen del log
+            channels = list(load_log(replay).values())
+            stream_names = sorted({channel.stream for channel in channels})
+            # Videos originales opcionales, en el orden de los streams; sin video se dibuja sobre negro
+            videos = dict(zip(stream_names, replay_videos or []))
+
+            self.streams = [Stream(self, name, videos.get(name, replay)) for name in stream_names]
+            for stream in self.streams:
+                stream.names = {channel.model: channel.names for channel in channels if channel.stream == stream.name}
+
+            self.threads = {"replay": ReplayThread(self, channels, speed=replay_speed, videos=videos)}
+            self.start_outputs(None, socket_path, map_inputs, zone_classes)
+            self.start_thread(self.threads["replay"])
+            return
+
+        self.streams = [Stream(self, f"stream{i}", source) for i, source in enumerate(sources)]
+
+        # Opciones comunes a todos los detectores (y a los workers del executor process)
+        detector_kwargs = {"motion_gate": motion_gate, "max_staleness": max_staleness, "smooth_keypoints": smooth_keypoints}
+
+        if hands_roi and hand_engine != "yolo":
+            raise ValueError("El modo ROI es del modelo YOLO de manos; MediaPipe ya sigue las manos por su cuenta")
+
+        if executor == "process":
+            if len(self.streams) > 1:
+                raise ValueError("El executor process no comparte modelos entre fuentes; usa --executor thread")
+            if hands_roi:
+                raise ValueError("El modo ROI necesita las cajas del control en el mismo proceso; usa --executor thread")
+
+            # Cada modelo en su propio proceso, fuera del GIL; repartimos los nucleos entre los dos
+            stream = self.streams[0]
+            num_threads = max(1, (os.cpu_count() or 2) // 2)
+            stream.threads = {
+                "camera": CameraThread(stream, stream.source),
+                "controller": ProcessDetectionThread(stream, f"{MODELS_DIR}/controller_model.pt", "controller", num_threads=num_threads, frame_time=self.frame_time, backend=backend, **detector_kwargs),
+                "hands": (
+                    HandsThread(stream, mode=mediapipe_mode) if hand_engine == "mediapipe" else
+                    ProcessDetectionThread(stream, f"{MODELS_DIR}/hand_model.pt", "hands", num_threads=num_threads, frame_time=self.frame_time, backend=backend, **detector_kwargs)
+                ),
+            }
+            stream.names = {name: stream.threads[name].names for name in ("controller", "hands")}
+            self.threads = {}
+            self.start_outputs(log_dir, socket_path, map_inputs, zone_classes)
+
+            for thread in stream.threads.values():
+                self.start_thread(thread)
+            return
+
+        # Un modelo por tipo para todas las fuentes; cada stream tiene su tracker y su scheduler.
+        # onnx/openvino se exportan con el batch fijo del forward compartido
+        batch = min(max_batch or len(self.streams), len(self.streams))
+        controller_model = load_model(f"{MODELS_DIR}/controller_model.pt", backend, batch=batch)
+        hand_model = load_model(f"{MODELS_DIR}/hand_model.pt", backend, batch=batch) if hand_engine == "yolo" else None
+
+        for stream in self.streams:
+            controller = DetectionThread(stream, f"{MODELS_DIR}/controller_model.pt", "controller", model=controller_model, **detector_kwargs)
+            if hand_engine == "mediapipe":
+                # MediaPipe corre en su propio hilo; el pool de inferencia queda solo con el control
+                hands = HandsThread(stream, mode=mediapipe_mode)
+                stream.detectors = [controller]
+            else:
+                # Con ROI las manos se buscan en un recorte alrededor del control de este stream
+                hands = DetectionThread(stream, f"{MODELS_DIR}/hand_model.pt", "hands", model=hand_model, roi_source=controller if hands_roi else None, **detector_kwargs)
+                stream.detectors = [controller, hands]
+
+            stream.threads = {
+                "camera": CameraThread(stream, stream.source),
+                "controller": controller,
+                "hands": hands,
+            }
+            stream.names = {"controller": controller.names, "hands": hands.names}
 
         self.threads = {
-            "camera": CameraThread(self), 
-            "controller": DetectionThread(self, f"{MODELS_DIR}/controller_model.pt", "controller", max_stride=1),
-            "hands": DetectionThread(self, f"{MODELS_DIR}/hand_model.pt", "hands", max_stride=1),
+            # Un solo hilo de inferencia: cada frame se preprocesa una vez y los frames de
+            # todas las fuentes pasan juntos por cada modelo
+            "inference": InferenceThread(self, self.streams, max_batch=max_batch, max_wait=max_wait),
         }
 
-        self.start_thread("camera")
-        self.start_thread("controller")
-        self.start_thread("hands")
+        self.start_outputs(log_dir, socket_path, map_inputs, zone_classes)
+        for stream in self.streams:
+            self.start_thread(stream.threads["camera"])
+            if hand_engine == "mediapipe":
+                self.start_thread(stream.threads["hands"])
+        self.start_thread(self.threads["inference"])
+
+    def start_outputs(self, log_dir, socket_path, map_inputs=False, zone_classes=None):
+        # Los detectores solo encolan/agendan; el writer y el servidor trabajan en sus hilos
+        if log_dir is not None:
+            self.result_log = ResultLogWriter(log_dir)
+            for stream in self.streams:
+                stream.publish_to(self.result_log)
+
+        if socket_path is not None:
+            self.result_server = ResultServer(socket_path)
+            for stream in self.streams:
+                stream.publish_to(self.result_server)
+
+        if map_inputs:
+            # Sin ventana los eventos salen por consola; con ventana se dibujan las entradas activas
+            listener = self.print_input_event if self.headless else None
+            for stream in self.streams:
+                stream.map_inputs(InputMapper(stream.names["controller"], zone_classes), listener)
+
+    def print_input_event(self, stream, event):
+        print(f"{stream.name}: {event.label} {'presionado' if event.pressed else 'soltado'} (frame {event.frame_id})")
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set()
+
+    def stop(self):
+        self.stop_event.set()
+        # Liberamos a los hilos bloqueados esperando frames o resultados
+        for stream in self.streams:
+            stream.frame_buffer.close()
+        self.results_ready.set()
+
+        for thread in self.running_threads:
+            thread.join(timeout=1.0)
+
+        # Despues de los detectores: el ultimo chunk incluye todo lo publicado
+        if self.result_log is not None:
+            self.result_log.close()
+        if self.result_server is not None:
+            self.result_server.close()
 
     def display_boxes(self, display_frame, current_results, class_names):
-        if (current_results is not None and current_results.boxes is not None and len(current_results.boxes) > 0):
-            boxes = current_results.boxes.xyxy.cpu().numpy()
-            classes = current_results.boxes.cls.cpu().numpy()
-            confidences = current_results.boxes.conf.cpu().numpy()
-            
-            for _, (box, class_id, confidence) in enumerate(zip(boxes, classes, confidences)):
-                x1, y1, x2, y2 = map(int, box)
-                class_name = class_names[int(class_id)]
-                confidence = float(confidence)
-                
-                cv2.rectangle(display_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                label = f"{class_name}: {confidence:.2f}"
-                cv2.putText(display_frame, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        # Detections: arrays NumPy, sin tensores ni frame
+        if current_results is not None:
+            self.overlay.draw_boxes(display_frame, current_results, class_names)
         
-    def display_controller(self, display_frame):
-        results = self.mutex["controller"].get()
-        self.display_boxes(display_frame, results, self.threads["controller"].model.names)
+    def display_controller(self, display_frame, stream):
+        results = stream.mutex["controller"].get()
+        self.display_boxes(display_frame, results, stream.names["controller"])
     
-    def display_hands(self, display_frame):
-        results = self.mutex["hands"].get()
+    def display_hands(self, display_frame, stream):
+        results = stream.mutex["hands"].get()
         
-        self.display_boxes(display_frame, results, self.threads["hands"].model.names)
-        if results is not None and results.keypoints is not None:
-            h, w = results.keypoints.orig_shape
-
-            kpts_xyn = results.keypoints.xyn.cpu().numpy()
-            kpts_conf = results.keypoints.conf.cpu().numpy()
-
-            for hand_id in range(kpts_xyn.shape[0]):
-                for (xn, yn), conf in zip(kpts_xyn[hand_id], kpts_conf[hand_id]):
-                    if conf > 0.5:
-                        x = int(xn * w)
-                        y = int(yn * h)
-                        cv2.circle(display_frame, (x, y), 4, (0, 0, 255), -1)
+        self.display_boxes(display_frame, results, stream.names["hands"])
+        if results is not None:
+            # Todos los keypoints de todas las manos en una sola pasada
+            self.overlay.draw_keypoints(display_frame, results)
         
-    def display_fps(self, display_frame, current_time):
+    def display_inputs(self, display_frame, stream):
+        if stream.mapper is None:
+            return
+        label = " + ".join(sorted(stream.mapper.active)) or "-"
+        h = display_frame.shape[0]
+        cv2.putText(display_frame, f"Entrada: {label}", (10, h - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 255), 2)
+
+    def update_fps(self, current_time):
         self.fps_count += 1 #Contamos los frames
         if current_time - self.fps_time >= 1.0: #Si paso mas de un segundo, actuazamos el contador
             self.fps = self.fps_count
             self.fps_count = 0
             self.fps_time = current_time
-        
+
+    def display_fps(self, display_frame):
         cv2.putText(display_frame, f"FPS: {self.fps}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
 
-    def start_thread(self, name):
-        thread = threading.Thread(target=self.threads[name].run)
+    def display_stats(self, display_frame, stream):
+        y = 55
+        for name, stats in stream.stats.snapshot().get("detectors", {}).items():
+            total = stats["total_ms"]
+            process = stats["process_ms"]
+            latency = "--" if total is None else f"{total:.0f} ms"
+            work = "--" if process is None else f"{process:.0f} ms"
+            label = (
+                f"{name}: cap->pub {latency} proc {work} | "
+                f"inf {stats['inferences']} kalman {stats['follows']} "
+                f"inest {stats['unstable']} espera {stats['backoff_sleeps']} quieto {stats['motion_reused']}"
+            )
+            cv2.putText(display_frame, label, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1)
+            y += 20
+
+    def get_detection_frame(self, stream):
+        frame_ids = [
+            results.frame_id for results in (stream.mutex["controller"].get(), stream.mutex["hands"].get())
+            if results is not None
+        ]
+        frame_id = max(frame_ids) if frame_ids else None
+        frame = stream.frame_buffer.get(frame_id)
+        if frame is None:
+            frame_id, frame = stream.frame_buffer.latest()
+        return frame_id, frame
+
+    def copy_to_display(self, stream, frame_id, frame):
+        # Los frames del buffer son de solo lectura: dibujamos sobre un frame propio preasignado
+        if stream.display_frame is None or stream.display_frame.shape != frame.shape:
+            stream.display_frame = frame.copy()
+        else:
+            stream.display_frame[:] = frame
+
+        if not stream.frame_buffer.still_valid(frame_id):
+            # La camara piso el frame durante la copia: mostramos el ultimo (no se pisa hasta size - 1 frames)
+            _, frame = stream.frame_buffer.latest()
+            stream.display_frame[:] = frame
+        return stream.display_frame
+
+    def scheduler_stats(self):
+        # Decisiones del stride adaptativo (inferencia completa vs Kalman) por fuente y modelo
+        return {
+            stream.name: {name: stream.threads[name].scheduler_stats() for name in ("controller", "hands") if name in stream.threads}
+            for stream in self.streams
+        }
+
+    def log_stats(self):
+        # Resultados escritos y descartados por el log (cola llena)
+        return {} if self.result_log is None else self.result_log.stats()
+
+    def server_stats(self):
+        # Clientes conectados, mensajes enviados y reemplazados sin enviar
+        return {} if self.result_server is None else self.result_server.stats()
+
+    def batch_stats(self):
+        # Tamanos de batch logrados y espera en cola por modelo (solo executor thread)
+        if "inference" not in self.threads:
+            return {}
+        return self.threads["inference"].stats()
+
+    def stats_snapshot(self):
+        return {stream.name: stream.stats.snapshot() for stream in self.streams}
+
+    def start_thread(self, worker):
+        thread = threading.Thread(target=worker.run)
         thread.daemon = True
         thread.start()
+        self.running_threads.append(thread)
+
+    def run_headless(self):
+        # Los hilos hacen todo el trabajo; solo esperamos Ctrl+C
+        try:
+            while self.running:
+                self.stop_event.wait(1.0)
+        except KeyboardInterrupt:
+            pass
+        self.stop()
 
     def run(self):
+        if self.headless:
+            return self.run_headless()
+
         self.fps_time = time.time()
-        last_display_time = time.time()
-        
+
         while self.running:
-            current_time = time.time()
-            
-            if current_time - last_display_time >= self.frame_time:
-                last_display_time = current_time
+            # Despertamos con cada resultado nuevo; sin detecciones refrescamos igual a frame_time
+            self.results_ready.wait(self.frame_time)
+            self.results_ready.clear()
+            self.update_fps(time.time())
 
-                #Dibujamos el frame actual
-                current_frame = self.mutex["current_frame"].get()
-                if current_frame is not None:
-                    display_frame = current_frame.copy()
-                    # Detection Boxes
-                    self.display_controller(display_frame)
-                    self.display_hands(display_frame)
+            for stream in self.streams:
+                #Dibujamos el frame que corresponde a la ultima deteccion
+                frame_id, current_frame = self.get_detection_frame(stream)
+                if current_frame is None:
+                    continue
 
-                    # FPS
-                    self.display_fps(display_frame, current_time)
+                display_frame = self.copy_to_display(stream, frame_id, current_frame)
+                # Detection Boxes
+                self.display_controller(display_frame, stream)
+                self.display_hands(display_frame, stream)
+                self.display_inputs(display_frame, stream)
 
-                    cv2.imshow("Detector de joystick", display_frame)
+                # FPS
+                self.display_fps(display_frame)
+                if self.stats_overlay:
+                    self.display_stats(display_frame, stream)
 
-            time.sleep(0.001)
+                title = WINDOW_TITLE if len(self.streams) == 1 else f"{WINDOW_TITLE} ({stream.name}: {stream.source})"
+                cv2.imshow(title, display_frame)
 
             key = cv2.waitKey(1) & 0xFF
             if key == 27:
-                self.running = False
                 break
-        
+
+        self.stop()
         cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
-    detector = JoystickDetector()
+    parser = argparse.ArgumentParser(description="YOLO Detection visualizator")
+    parser.add_argument("--sources", nargs="+", default=["0"],
+                        help="Camaras (indice), archivos de video o URLs rtsp://; todas comparten los modelos")
+    parser.add_argument("--max-batch", type=int, default=None,
+                        help="Maximo de fuentes por forward; las atendidas hace mas tiempo van primero")
+    parser.add_argument("--max-wait", type=float, default=MAX_WAIT * 1000,
+                        help="Milisegundos que se espera a las demas fuentes para llenar el batch")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread",
+                        help="thread: inferencia compartida en este proceso; process: un proceso worker por modelo")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="Runtime de los modelos; onnx/openvino exportan el .pt a imgsz fijo la primera vez")
+    parser.add_argument("--hands-roi", action="store_true",
+                        help="Detecta manos en un recorte ampliado alrededor del control (frame completo si no hay control)")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="Reusa los resultados anteriores mientras la escena no se mueva")
+    parser.add_argument("--max-staleness", type=int, default=MAX_STALENESS,
+                        help="Frames seguidos que el motion gate puede reusar antes de forzar una inferencia")
+    parser.add_argument("--hand-engine", choices=["yolo", "mediapipe"], default="yolo",
+                        help="Detector de manos: hand_model.pt o HandLandmarker de MediaPipe (models/hand_landmarker.task)")
+    parser.add_argument("--mediapipe-mode", choices=list(RUNNING_MODES), default="video",
+                        help="video: sincronico con seguimiento; live_stream: asincronico, descarta frames si se atrasa")
+    parser.add_argument("--smooth-keypoints", action="store_true",
+                        help="Filtro One-Euro por track en los keypoints; tambien los predice en los frames de Kalman")
+    parser.add_argument("--stats", action="store_true",
+                        help="Registra timestamps por etapa y contadores (detector.stats_snapshot())")
+    parser.add_argument("--stats-overlay", action="store_true",
+                        help="Igual que --stats, y ademas los dibuja sobre el video")
+    parser.add_argument("--log", default=None,
+                        help="Directorio donde grabar los resultados (chunks .npz columnares, ver result_log.load_log)")
+    parser.add_argument("--replay", default=None,
+                        help="Directorio de un log grabado con --log: muestra esos resultados sin correr los modelos")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="Velocidad del replay (2 = doble, 0 = lo mas rapido posible)")
+    parser.add_argument("--replay-videos", nargs="+", default=None,
+                        help="Videos originales de cada stream para dibujar debajo del replay")
+    parser.add_argument("--headless", action="store_true",
+                        help="Sin ventanas ni dibujo; usar con --socket y/o --log")
+    parser.add_argument("--socket", nargs="?", const=SOCKET_PATH, default=None,
+                        help=f"Publica cada resultado por un socket Unix (default {SOCKET_PATH}); cliente en result_client.py")
+    parser.add_argument("--map-inputs", action="store_true",
+                        help="Traduce manos + zonas del control a entradas (button_A, stick_left_up, combo_L1_R2, ...)")
+    parser.add_argument("--zone-classes", default=None,
+                        help="JSON {zona: clase del detector de control} si las clases no se llaman como las zonas")
+    args = parser.parse_args()
+
+    zone_classes = None
+    if args.zone_classes is not None:
+        with open(args.zone_classes) as f:
+            zone_classes = json.load(f)
+
+    detector = JoystickDetector(
+        sources=args.sources,
+        executor=args.executor,
+        backend=args.backend,
+        stats=args.stats,
+        stats_overlay=args.stats_overlay,
+        max_batch=args.max_batch,
+        max_wait=args.max_wait / 1000,
+        hands_roi=args.hands_roi,
+        motion_gate=args.motion_gate,
+        max_staleness=args.max_staleness,
+        smooth_keypoints=args.smooth_keypoints,
+        hand_engine=args.hand_engine,
+        mediapipe_mode=args.mediapipe_mode,
+        log_dir=args.log,
+        replay=args.replay,
+        replay_speed=args.replay_speed,
+        replay_videos=args.replay_videos,
+        headless=args.headless,
+        socket_path=args.socket,
+        map_inputs=args.map_inputs,
+        zone_classes=zone_classes
+    )
     detector.run()